@@ -0,0 +1,140 @@
+# benchmarks/fake_drive.py
+"""In-process stand-in for the parts of the Drive v3 client the bot uses."""
+import io
+import re
+import time
+import hashlib
+import threading
+
+
+def _pixels(index, count):
+    """Pseudo-random bytes seeded by index, so every image looks different."""
+    blocks = []
+    block = hashlib.md5(str(index).encode()).digest()
+    for _ in range(-(-count // len(block))):
+        block = hashlib.md5(block).digest()
+        blocks.append(block)
+    return b"".join(blocks)[:count]
+
+
+def make_image_bytes(index, size, image="gif"):
+    """Deterministic, decodable image content of about `size` bytes (unique per index)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        head = b"GIF89a" + index.to_bytes(4, "big")
+        return head + b"\0" * max(0, size - len(head))
+
+    buffer = io.BytesIO()
+    if image == "jpeg":
+        side = max(16, int((size / 3) ** 0.5))
+        Image.frombytes("RGB", (side, side), _pixels(index, side * side * 3)).save(buffer, "JPEG", quality=95)
+    else:
+        # A small random-pixel GIF, padded to size after its trailer (decoders stop there)
+        Image.frombytes("L", (32, 32), _pixels(index, 32 * 32)).save(buffer, "GIF")
+        buffer.write(b"\0" * max(0, size - buffer.tell()))
+    return buffer.getvalue()
+
+
+class FakeDrive:
+    """
+    folders × files_per_folder images. files().list honours page_size (the
+    server-side cap) and "'<id>' in parents" clauses; get_media() returns a
+    request that MediaIoBaseDownload can drive. Latency is injected per call.
+    """
+
+    def __init__(self, folders=3, files_per_folder=20, file_size=200 * 1024,
+                 page_size=100, latency=0.05, image="gif"):
+        self.folder_ids = [f"folder{n}" for n in range(folders)]
+        self.page_size = page_size
+        self.latency = latency
+        self.image = image
+        self.lock = threading.Lock()
+        self.calls = {"files.list": 0, "files.get_media": 0, "bytes": 0}
+        self.items = {}
+        self._content = {}
+        index = 0
+        for folder_id in self.folder_ids:
+            for n in range(files_per_folder):
+                data = make_image_bytes(index, file_size, image)
+                file_id = f"file{index}"
+                self._content[file_id] = data
+                self.items[file_id] = {
+                    "id": file_id,
+                    "name": f"image_{index}.{'jpg' if image == 'jpeg' else 'gif'}",
+                    "mimeType": "image/jpeg" if image == "jpeg" else "image/gif",
+                    "md5Checksum": hashlib.md5(data).hexdigest(),
+                    "parents": [folder_id],
+                    "createdTime": f"2024-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}Z",
+                    "size": str(len(data)),
+                }
+                index += 1
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.calls[key] += amount
+
+    # --- service surface ---------------------------------------------------
+    def files(self):
+        return self
+
+    def list(self, q, fields=None, pageSize=100, pageToken=None, **kwargs):
+        parents = set(re.findall(r"'([^']+)' in parents", q))
+        matches = [item for item in self.items.values() if parents & set(item["parents"])]
+        start = int(pageToken or 0)
+        size = min(pageSize, self.page_size)
+        page = {"files": [dict(item) for item in matches[start:start + size]]}
+        if start + size < len(matches):
+            page["nextPageToken"] = str(start + size)
+        return _Execute(self, page)
+
+    def get_media(self, fileId):
+        self._count("files.get_media")
+        return _MediaRequest(self, fileId)
+
+    def http(self):
+        """Per-thread client handed to main._download_file by the harness."""
+        return _FakeHttp(self)
+
+
+class _Execute:
+    def __init__(self, drive, result):
+        self.drive = drive
+        self.result = result
+
+    def execute(self, num_retries=0):
+        self.drive._count("files.list")
+        time.sleep(self.drive.latency)
+        return self.result
+
+
+class _MediaRequest:
+    """Just enough of googleapiclient's HttpRequest for MediaIoBaseDownload."""
+
+    def __init__(self, drive, file_id):
+        self.http = _FakeHttp(drive)
+        self.uri = f"fake://drive/{file_id}"
+        self.headers = {}
+
+
+class _FakeHttp:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        import httplib2
+
+        file_id = uri.rsplit("/", 1)[-1]
+        data = self.drive._content[file_id]
+        first, last = 0, len(data) - 1
+        match = re.match(r"bytes=(\d+)-(\d+)", (headers or {}).get("range", ""))
+        if match:
+            first, last = int(match.group(1)), min(int(match.group(2)), len(data) - 1)
+        chunk = data[first:last + 1]
+        time.sleep(self.drive.latency)
+        self.drive._count("bytes", len(chunk))
+        response = httplib2.Response({
+            "status": "206" if match else "200",
+            "content-range": f"bytes {first}-{last}/{len(data)}",
+        })
+        return response, chunk
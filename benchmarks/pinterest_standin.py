@@ -0,0 +1,168 @@
+# benchmarks/pinterest_standin.py
+"""Local HTTP stand-in for the Pinterest v5 endpoints the bot calls."""
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class PinterestStandIn:
+    """
+    Serves /v5/pins, /v5/oauth/token, /v5/boards, /v5/boards/{id}/pins and
+    the /v5/media flow on 127.0.0.1.
+    - latency: seconds added to every request
+    - error_429 / error_5xx: fraction of pin creations answered with 429 / 503
+    - rate_limit: pin creations allowed per second, advertised through
+      X-RateLimit-* headers and enforced with 429 + Retry-After (0 = off)
+    - upload_location: whether media uploads answer with a Location header
+    - pin_list_error: status returned by GET /v5/boards/{id}/pins (0 = answer normally)
+    Inline (image_base64) pins other than JPEG and PNG are refused with 400, as Pinterest does.
+    Injected failures are drawn from a seeded RNG so runs are repeatable.
+    Every request is logged in order, with its headers, in `requests`.
+    """
+
+    def __init__(self, latency=0.1, error_429=0.0, error_5xx=0.0, rate_limit=0, seed=1, upload_location=True,
+                 pin_list_error=0):
+        self.latency = latency
+        self.error_429 = error_429
+        self.error_5xx = error_5xx
+        self.rate_limit = rate_limit
+        self.upload_location = upload_location
+        self.pin_list_error = pin_list_error
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.requests = []  # {"call", "headers"} in arrival order
+        self.pins = []
+        self._window_start = time.monotonic()
+        self._window_used = 0
+        self._media = 0
+
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                standin.handle(self, "GET")
+
+            def do_POST(self):
+                standin.handle(self, "POST")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v5"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # --- request handling --------------------------------------------------
+    def _count(self, name, handler):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.requests.append({"call": name, "headers": dict(handler.headers)})
+
+    def _reply(self, handler, status, body, headers=None):
+        # A 204 has no body; sending one corrupts the next response on the connection
+        data = json.dumps(body).encode("utf-8") if status != 204 else b""
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def handle(self, handler, method):
+        length = int(handler.headers.get("Content-Length") or 0)
+        raw = handler.rfile.read(length) if length else b""
+        path = handler.path.split("?", 1)[0]
+        time.sleep(self.latency)
+
+        if method == "POST" and path == "/v5/pins":
+            self._count("POST /pins", handler)
+            return self._create_pin(handler, json.loads(raw or b"{}"))
+        if method == "POST" and path == "/v5/oauth/token":
+            self._count("POST /oauth/token", handler)
+            return self._reply(handler, 200, {"access_token": "bench-token", "expires_in": 3600})
+        if method == "GET" and path.startswith("/v5/boards/") and path.endswith("/pins"):
+            self._count("GET /boards/{id}/pins", handler)
+            if self.pin_list_error:
+                return self._reply(handler, self.pin_list_error, {"message": "unavailable"})
+            board_id = path.split("/")[3]
+            with self.lock:
+                items = [pin for pin in self.pins if pin["board_id"] == board_id]
+            return self._reply(handler, 200, {"items": items, "bookmark": None})
+        if method == "GET" and path == "/v5/boards":
+            self._count("GET /boards", handler)
+            return self._reply(handler, 200, {"items": [{"id": "1", "name": "Benchmark"}]})
+        if method == "POST" and path == "/v5/media":
+            self._count("POST /media", handler)
+            with self.lock:
+                self._media += 1
+                media_id = f"m{self._media}"
+            return self._reply(handler, 201, {
+                "media_id": media_id,
+                "upload_url": f"{self.base_url}/upload/{media_id}",
+                "upload_parameters": {"key": media_id},
+            })
+        if method == "POST" and path.startswith("/v5/upload/"):
+            self._count("POST /upload", handler)
+            location = f"{self.base_url}/objects/{path.rsplit('/', 1)[-1]}"
+            return self._reply(handler, 204, {}, {"Location": location} if self.upload_location else {})
+        if method == "GET" and path.startswith("/v5/media/"):
+            self._count("GET /media/{id}", handler)
+            return self._reply(handler, 200, {"status": "succeeded"})
+
+        self._count(f"{method} other", handler)
+        return self._reply(handler, 404, {"message": "not found"})
+
+    def _rate_headers(self):
+        """Consume one request from the current 1s window; returns (allowed, headers)."""
+        if not self.rate_limit:
+            return True, {}
+        with self.lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_used = 0
+            self._window_used += 1
+            remaining = self.rate_limit - self._window_used
+            reset = max(0.0, 1.0 - (now - self._window_start))
+        headers = {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(0, remaining)),
+            "X-RateLimit-Reset": f"{reset:.2f}",
+        }
+        if remaining < 0:
+            headers["Retry-After"] = f"{max(reset, 0.1):.2f}"
+            return False, headers
+        return True, headers
+
+    def _create_pin(self, handler, body):
+        source = body.get("media_source") or {}
+        if source.get("source_type") == "image_base64" and source.get("content_type") not in ("image/jpeg", "image/png"):
+            return self._reply(handler, 400, {"message": f"Unsupported content_type {source.get('content_type')}"})
+        allowed, headers = self._rate_headers()
+        with self.lock:
+            roll = self.random.random()
+        if not allowed or roll < self.error_429:
+            headers.setdefault("Retry-After", "0.5")
+            return self._reply(handler, 429, {"message": "rate limited"}, headers)
+        if roll < self.error_429 + self.error_5xx:
+            return self._reply(handler, 503, {"message": "unavailable"}, headers)
+
+        with self.lock:
+            pin = {"id": f"pin{len(self.pins) + 1}", "board_id": body.get("board_id"), "note": body.get("note")}
+            self.pins.append(pin)
+        return self._reply(handler, 201, pin, headers)
@@ -0,0 +1,236 @@
+# benchmarks/run.py
+"""
+Offline end-to-end benchmarks: run_daily_uploads / post_to_pinterest against
+an in-process fake Drive service and a local Pinterest v5 stand-in.
+
+    python benchmarks/run.py                   # all scenarios, compared to baseline.json
+    python benchmarks/run.py daily daily-flaky # selected scenarios
+    python benchmarks/run.py --save-baseline   # record the current numbers as the baseline
+    python benchmarks/run.py --check           # exit 1 when a scenario regressed
+
+Each scenario runs in a fresh process inside a temporary working directory,
+so history, outbox and download cache start empty and peak RSS is per run.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_FILE = os.path.join(BENCH_DIR, "results", "latest.json")
+RESULT_MARKER = "BENCH_RESULT "
+
+# Relative change that counts as a regression
+THRESHOLDS = {"images_per_sec": -0.15, "wall_s": 0.15, "peak_rss_mb": 0.25}
+
+BASE = dict(
+    mode="daily", prefetch=False, folders=3, files_per_folder=20, file_size=200 * 1024,
+    page_size=100, image="gif", drive_latency=0.05, pin_latency=0.1,
+    error_429=0.0, error_5xx=0.0, rate_limit=0, upload_rate=20,
+)
+SCENARIOS = {
+    "daily": dict(BASE),
+    "daily-prefetch-small-pages": dict(BASE, prefetch=True, page_size=10),
+    "daily-flaky": dict(BASE, error_429=0.05, error_5xx=0.05),
+    "daily-rate-limited": dict(BASE, rate_limit=5),
+    "daily-large-files": dict(BASE, folders=1, files_per_folder=10, file_size=8 * 1024 * 1024, image="jpeg"),
+    "post-pending": dict(BASE, mode="post", folders=1, files_per_folder=60),
+}
+
+
+# --- child: one scenario in this process --------------------------------
+def run_scenario(config):
+    sys.path.insert(0, REPO_DIR)
+    from pinterest_standin import PinterestStandIn
+    from fake_drive import FakeDrive
+
+    standin = PinterestStandIn(
+        latency=config["pin_latency"], error_429=config["error_429"],
+        error_5xx=config["error_5xx"], rate_limit=config["rate_limit"],
+    ).start()
+    drive = FakeDrive(
+        folders=config["folders"], files_per_folder=config["files_per_folder"],
+        file_size=config["file_size"], page_size=config["page_size"],
+        latency=config["drive_latency"], image=config["image"],
+    )
+    total = config["folders"] * config["files_per_folder"]
+
+    os.environ.update({
+        "PINTEREST_API_BASE": standin.base_url,
+        "PINTEREST_REFRESH_TOKEN": "bench-refresh",
+        "PINTEREST_BOARD_ID": "1",
+        "MAX_PINS_PER_DAY": str(total),
+        "DRIVE_PREFETCH": "true" if config["prefetch"] else "false",
+        "UPLOAD_RATE_PER_SEC": str(config["upload_rate"]),
+        "EMAIL_ASYNC": "false",
+    })
+    os.environ.pop("PINTEREST_ACCESS_TOKEN", None)
+    for n, folder_id in enumerate(drive.folder_ids, 1):
+        os.environ[f"DRIVE_FOLDER_ID_{n}"] = folder_id
+
+    import main
+    import upload_outbox
+    import download_cache
+    from http_client import get_session
+    from token_manager import get_access_token
+    from tracing import run_trace
+
+    main.connect_drive = lambda: drive
+    main._drive_credentials = object()  # enables per-thread download clients
+    main._worker_http = drive.http
+    upload_outbox.BACKOFF_BASE = 0.2    # keep retry waits short in the flaky scenarios
+
+    if config["mode"] == "post":
+        for item in drive.items.values():
+            with open(download_cache.cache_path(item), "wb") as f:
+                f.write(drive._content[item["id"]])
+            download_cache.record_download(item)
+        download_cache.flush_index()
+
+    started = time.perf_counter()
+    with run_trace("bench"):
+        token = get_access_token()
+        if config["mode"] == "post":
+            posted = main.post_to_pinterest(token, max_pins=total)["posted"]
+        else:
+            posted = main.run_daily_uploads(token)["posted"]
+    wall = time.perf_counter() - started
+
+    import resource
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    stages = {}
+    traces = sorted(glob.glob(os.path.join("logs", "traces", "bench-*.jsonl")), key=os.path.getmtime)
+    if traces:
+        with open(traces[-1], "r", encoding="utf-8") as f:
+            summary = json.loads(f.readlines()[-1])
+        stages = {name: round(t["total"], 3) for name, t in summary.get("totals", {}).items()}
+
+    pinterest_calls = dict(standin.calls)
+    standin.stop()
+    http_stats = get_session().stats()
+    return {
+        "posted": posted,
+        "images": total,
+        "wall_s": round(wall, 3),
+        "images_per_sec": round(posted / wall, 2) if wall else 0.0,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "stage_busy_s": stages,
+        "http_calls": {
+            "pinterest": pinterest_calls,
+            "drive": {key: value for key, value in drive.calls.items() if key != "bytes"},
+            "connections": sum(http_stats["connections"].values()),
+        },
+        "drive_bytes": drive.calls["bytes"],
+    }
+
+
+# --- parent: orchestration and reporting --------------------------------
+def run_child(name, config, verbose):
+    workdir = tempfile.mkdtemp(prefix=f"pinbench-{name}-")
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(config)],
+        cwd=workdir, capture_output=True, text=True,
+    )
+    if verbose or proc.returncode != 0:
+        sys.stdout.write(proc.stdout)
+        sys.stderr.write(proc.stderr)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise RuntimeError(f"scenario {name} failed (exit {proc.returncode})")
+
+
+def compare(name, result, baseline):
+    """Regression messages for one scenario against its baseline entry."""
+    base = baseline.get(name)
+    if not base:
+        return []
+    problems = []
+    for metric, limit in THRESHOLDS.items():
+        old, new = base.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (limit < 0 and change < limit) or (limit > 0 and change > limit):
+            problems.append(f"{metric} {old} → {new} ({change:+.0%})")
+    return problems
+
+
+def print_report(results, baseline):
+    print(f"\n{'scenario':<28}{'posted':>8}{'wall s':>9}{'img/s':>8}{'RSS MB':>9}{'HTTP':>7}  vs baseline")
+    regressions = {}
+    for name, result in results.items():
+        calls = sum(result["http_calls"]["pinterest"].values()) + sum(result["http_calls"]["drive"].values())
+        base = baseline.get(name, {})
+        delta = ""
+        if base.get("images_per_sec"):
+            delta = f"{(result['images_per_sec'] - base['images_per_sec']) / base['images_per_sec']:+.0%} img/s"
+        print(f"{name:<28}{result['posted']:>5}/{result['images']:<3}{result['wall_s']:>8.2f}"
+              f"{result['images_per_sec']:>8.1f}{result['peak_rss_mb']:>9.1f}{calls:>7}  {delta}")
+        problems = compare(name, result, baseline)
+        if problems:
+            regressions[name] = problems
+
+    for name, result in results.items():
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in
+                           sorted(result["stage_busy_s"].items(), key=lambda item: -item[1])[:5])
+        print(f"   {name}: {stages}")
+        print(f"   {'':<{len(name)}}  pinterest {result['http_calls']['pinterest']} | drive {result['http_calls']['drive']}")
+
+    for name, problems in regressions.items():
+        print(f"⚠️ Regression in {name}: {'; '.join(problems)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help=f"any of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--save-baseline", action="store_true", help="write results to baseline.json")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any scenario regressed")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the bot's own output")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_scenario(json.loads(args.child))
+        print(RESULT_MARKER + json.dumps(result))
+        return 0
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        print(f"▶️  {name} ...", flush=True)
+        results[name] = run_child(name, SCENARIOS[name], args.verbose)
+        results[name]["config"] = SCENARIOS[name]
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = print_report(results, baseline)
+
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    with open(RESULTS_FILE, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"💾 Baseline saved to {BASELINE_FILE}")
+
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# board_routing.py
+import os
+import json
+import time
+import threading
+from download_cache import folders_for
+from get_board_id import get_board_directory
+from token_manager import get_access_token
+
+DEFAULT_BOARD = os.getenv("PINTEREST_BOARD_ID")
+# JSON object mapping a Drive folder id to a board name/id or a list of them.
+# "*" applies to folders without their own rule; otherwise PINTEREST_BOARD_ID is used.
+# e.g. {"1AbC...": ["Mahakali", "Bhairava"], "*": "Mahakali"}
+BOARD_ROUTES = os.getenv("BOARD_ROUTES", "")
+# A board name that failed to resolve is looked up again after this many seconds
+BOARD_RETRY_SECONDS = int(os.getenv("BOARD_RETRY_SECONDS", 300))
+
+
+def load_routes(spec=BOARD_ROUTES):
+    """Parse BOARD_ROUTES into {folder_id: [board, ...]}."""
+    if not spec.strip():
+        return {}
+    try:
+        routes = json.loads(spec)
+    except ValueError as e:
+        print(f"⚠️ Ignoring invalid BOARD_ROUTES: {e}")
+        return {}
+    return {
+        folder: [boards] if isinstance(boards, str) else list(boards)
+        for folder, boards in routes.items()
+    }
+
+
+def history_key(file_key, board_id):
+    """
+    Upload-history key for one (file, board) pair. The default board keeps
+    the bare file key, so history written before routing existed still counts.
+    """
+    if not board_id or board_id == DEFAULT_BOARD:
+        return file_key
+    return f"{file_key}@{board_id}"
+
+
+class BoardRouter:
+    """Decides which boards an image goes to, from the Drive folders it came from."""
+
+    def __init__(self, routes=None, default_board=DEFAULT_BOARD):
+        self.routes = load_routes() if routes is None else routes
+        self.default_board = default_board
+        self._lock = threading.Lock()
+        self._resolved = {}  # board name/id -> (board id or None, time of the lookup)
+
+    def _resolve(self, board):
+        with self._lock:
+            cached = self._resolved.get(board)
+            if cached and (cached[0] or time.monotonic() - cached[1] < BOARD_RETRY_SECONDS):
+                return cached[0]
+            try:
+                # The token is only fetched if board names have to be listed
+                board_id = get_board_directory().resolve(board, get_access_token)
+            except Exception as e:
+                print(f"⚠️ Could not resolve board {board!r}: {e}")
+                board_id = None
+            self._resolved[board] = (board_id, time.monotonic())
+            return board_id
+
+    def resolve_folders(self, folder_ids):
+        """
+        (board ids, unresolved) for an image listed in folder_ids: the boards
+        it goes to (several per folder allowed), and the routed board names
+        that can't be resolved right now. Those still have to get the image.
+        """
+        refs = []
+        for folder_id in folder_ids:
+            refs.extend(self.routes.get(folder_id, []))
+        if not refs:
+            refs = self.routes.get("*") or [self.default_board]
+
+        boards = []
+        unresolved = []
+        for ref in refs:
+            if not ref:
+                continue
+            board_id = self._resolve(ref)
+            if not board_id:
+                unresolved.append(ref)
+            elif board_id not in boards:
+                boards.append(board_id)
+        return boards, unresolved
+
+    def boards_for_folders(self, folder_ids):
+        """Board ids an image listed in folder_ids can be posted to now."""
+        return self.resolve_folders(folder_ids)[0]
+
+    def resolve_file(self, file_key):
+        """resolve_folders() for a downloaded file (looked up through the cache index)."""
+        return self.resolve_folders(folders_for(file_key))
+
+    def boards_for_file(self, file_key):
+        """Board ids a downloaded file can be posted to now."""
+        return self.boards_for_folders(folders_for(file_key))
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_board_router():
+    """Process-wide router built from BOARD_ROUTES."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = BoardRouter()
+        return _router
@@ -1,13 +1,13 @@
-from token_manager import refresh_access_token
+from token_manager import get_access_token
 from main import run_daily_uploads
 
 def run():
-    tokens = refresh_access_token()
-    if not tokens:
+    # Reuses a cached token when one is still valid; refreshes otherwise
+    access_token = get_access_token()
+    if not access_token:
         print("❌ Failed to refresh Pinterest token. Aborting.")
         return
 
-    access_token = tokens["access_token"]
     run_daily_uploads(access_token)
 
 if __name__ == "__main__":
@@ -0,0 +1,261 @@
+# download_cache.py
+import os
+import json
+import time
+import threading
+from metrics import CACHE_EVICTIONS
+
+DOWNLOAD_DIR = "downloads"
+# Index of cached objects, kept alongside them so wiping the folder resets both
+CACHE_INDEX_FILE = os.path.join(DOWNLOAD_DIR, "cache_index.json")
+# Disk budget for downloaded images (0 = unbounded)
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_MB", 2048)) * 1024 * 1024
+# Unposted files used more recently than this are never evicted (they may be mid-upload)
+CACHE_MIN_AGE = int(os.getenv("DOWNLOAD_CACHE_MIN_AGE", 600))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def cache_name(item):
+    """
+    Content-addressed file name for a Drive item: <md5Checksum><ext>.
+    Identical bytes in different folders share a name; an edited file gets a
+    new one. Items without a checksum fall back to their Drive id.
+    """
+    ext = os.path.splitext(item["name"])[1].lower()
+    key = item.get("md5Checksum") or item["id"]
+    return f"{key}{ext}"
+
+
+def cache_path(item):
+    """Local path of a Drive item inside DOWNLOAD_DIR."""
+    return os.path.join(DOWNLOAD_DIR, cache_name(item))
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        try:
+            with open(CACHE_INDEX_FILE, "r", encoding="utf-8") as f:
+                _index = json.load(f)
+        except FileNotFoundError:
+            _index = {}
+        except Exception as e:
+            print(f"⚠️ Could not load {CACHE_INDEX_FILE}: {e}")
+            _index = {}
+        _adopt_files(_index)
+    return _index
+
+
+def _adopt_files(index):
+    """
+    Bring indexes written before download state was tracked up to date:
+    give old entries their size and whether the file is still on disk, and
+    index image files found in DOWNLOAD_DIR but not in the index (downloads
+    from older versions). Only touches the disk when something is missing.
+    """
+    if index and all("on_disk" in entry for entry in index.values()):
+        return
+    for name, entry in index.items():
+        if "on_disk" not in entry:
+            path = os.path.join(DOWNLOAD_DIR, name)
+            entry["on_disk"] = os.path.exists(path)
+            entry["size"] = os.path.getsize(path) if entry["on_disk"] else 0
+            entry["used"] = os.path.getmtime(path) if entry["on_disk"] else 0
+            entry["posted"] = False
+    if not os.path.isdir(DOWNLOAD_DIR):
+        return
+    for name in os.listdir(DOWNLOAD_DIR):
+        path = os.path.join(DOWNLOAD_DIR, name)
+        if name in index or not name.lower().endswith(IMAGE_EXTENSIONS) or not os.path.isfile(path):
+            continue
+        # No Drive id: these can't be fetched again, so they are only evicted once posted
+        index[name] = {"name": name, "ids": [], "parents": [], "on_disk": True, "posted": False,
+                       "size": os.path.getsize(path), "used": os.path.getmtime(path)}
+
+
+def is_known(item):
+    """Metadata check: has this exact content been downloaded before (even if evicted since)?"""
+    with _index_lock:
+        return cache_name(item) in _load_index()
+
+
+def is_cached(item):
+    """Is this exact content on disk right now?"""
+    with _index_lock:
+        entry = _load_index().get(cache_name(item))
+    return bool(entry) and entry["on_disk"]
+
+
+def record_download(item):
+    """
+    Remember a completed download (call flush_index() to persist), then
+    evict other files if the cache is over DOWNLOAD_CACHE_MAX_BYTES.
+    """
+    name = cache_name(item)
+    size = os.path.getsize(os.path.join(DOWNLOAD_DIR, name))
+    with _index_lock:
+        entry = _load_index().setdefault(name, {"ids": [], "posted": False})
+        # May have been adopted from the folder just now (by _load_index), without its Drive name
+        entry["name"] = item["name"]
+        if item["id"] not in entry["ids"]:
+            entry["ids"].append(item["id"])
+        # Source folders decide which boards the file is posted to
+        folders = entry.setdefault("parents", [])
+        for parent in item.get("parents", []):
+            if parent not in folders:
+                folders.append(parent)
+        if item.get("createdTime"):
+            entry["created"] = item["createdTime"]
+        entry["on_disk"] = True
+        entry["size"] = size
+        entry["used"] = time.time()
+        _evict_over_budget()
+
+
+def touch(file_name):
+    """Mark a cached file as just used (it moves to the back of the eviction order)."""
+    with _index_lock:
+        entry = _load_index().get(file_name)
+        if entry:
+            entry["used"] = time.time()
+
+
+def mark_posted(file_name):
+    """
+    Record that a file is on all its boards. Posted files are evicted
+    first, and are never downloaded again once evicted.
+    """
+    with _index_lock:
+        entry = _load_index().get(file_name)
+        if entry and not entry["posted"]:
+            entry["posted"] = True
+            _evict_over_budget()
+
+
+def pending_files():
+    """Sorted names of indexed images not yet posted to all their boards (evicted ones included)."""
+    with _index_lock:
+        return sorted(name for name, entry in _load_index().items() if not entry["posted"])
+
+
+def posted_files():
+    """Names of posted images that are still on disk."""
+    with _index_lock:
+        return [name for name, entry in _load_index().items() if entry["posted"] and entry["on_disk"]]
+
+
+def source_item(file_name):
+    """
+    Drive item for an indexed file, enough to fetch it again after eviction
+    (cache_name() of the result is file_name). None if no Drive id is known.
+    """
+    with _index_lock:
+        entry = _load_index().get(file_name)
+    if not entry or not entry["ids"]:
+        return None
+    return {
+        "id": entry["ids"][-1],
+        "name": entry["name"],
+        "md5Checksum": os.path.splitext(file_name)[0],
+        "parents": list(entry.get("parents", [])),
+    }
+
+
+def forget(file_name):
+    """Drop a file from the index (e.g. it no longer exists on Drive)."""
+    with _index_lock:
+        _load_index().pop(file_name, None)
+
+
+def cache_bytes():
+    """Bytes of downloaded images currently on disk."""
+    with _index_lock:
+        return sum(entry["size"] for entry in _load_index().values() if entry["on_disk"])
+
+
+def _evict_over_budget():
+    """
+    Delete files until the cache fits DOWNLOAD_CACHE_MAX_BYTES: posted files
+    first, then unposted ones least recently used first. Unposted files used
+    within CACHE_MIN_AGE, and ones with no Drive id to fetch them again, are
+    kept even if that leaves the cache over budget. Caller holds _index_lock.
+    """
+    if not DOWNLOAD_CACHE_MAX_BYTES:
+        return
+    index = _load_index()
+    total = sum(entry["size"] for entry in index.values() if entry["on_disk"])
+    if total <= DOWNLOAD_CACHE_MAX_BYTES:
+        return
+
+    cutoff = time.time() - CACHE_MIN_AGE
+    candidates = sorted(
+        (not entry["posted"], entry["used"], name) for name, entry in index.items()
+        if entry["on_disk"] and (entry["posted"] or (entry["used"] < cutoff and entry["ids"]))
+    )
+    evicted = 0
+    for _, _, name in candidates:
+        if total <= DOWNLOAD_CACHE_MAX_BYTES:
+            break
+        _remove_file(name)
+        index[name]["on_disk"] = False
+        total -= index[name]["size"]
+        evicted += 1
+
+    if evicted:
+        CACHE_EVICTIONS.inc(evicted)
+        print(f"🧹 Evicted {evicted} files from {DOWNLOAD_DIR} ({total / (1024 * 1024):.0f} MB kept)")
+    if total > DOWNLOAD_CACHE_MAX_BYTES:
+        print(f"⚠️ {DOWNLOAD_DIR} holds {total / (1024 * 1024):.0f} MB, over its "
+              f"{DOWNLOAD_CACHE_MAX_BYTES / (1024 * 1024):.0f} MB budget (recently used files are kept)")
+
+
+def _remove_file(name):
+    path = os.path.join(DOWNLOAD_DIR, name)
+    # Imported here: image_prep imports this module for DOWNLOAD_DIR
+    from image_prep import forget_normalized
+    try:
+        forget_normalized(path)
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ Could not evict {path}: {e}")
+
+
+def original_name(file_name):
+    """Drive file name behind a cached file name (for log messages)."""
+    with _index_lock:
+        entry = _load_index().get(file_name)
+    return entry["name"] if entry else file_name
+
+
+def folders_for(file_name):
+    """Drive folders a cached file was listed in ([] if unknown)."""
+    with _index_lock:
+        entry = _load_index().get(file_name)
+    return list(entry.get("parents", [])) if entry else []
+
+
+def created_for(file_name):
+    """Drive createdTime of a cached file ("" if unknown)."""
+    with _index_lock:
+        entry = _load_index().get(file_name)
+    return entry.get("created", "") if entry else ""
+
+
+def flush_index():
+    """Write the index atomically."""
+    with _index_lock:
+        if _index is None:
+            return
+        try:
+            tmp_path = CACHE_INDEX_FILE + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(_index, f)
+            os.replace(tmp_path, CACHE_INDEX_FILE)
+        except Exception as e:
+            print(f"⚠️ Could not save {CACHE_INDEX_FILE}: {e}")
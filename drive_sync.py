@@ -0,0 +1,126 @@
+# drive_sync.py
+import os
+import json
+from googleapiclient.errors import HttpError
+from metrics import DRIVE_LIST_SECONDS
+
+# Persisted next to the upload history so restarts resume from the same point
+PAGE_TOKEN_FILE = "drive_page_token.json"
+
+CHANGES_PAGE_SIZE = 1000
+CHANGES_FIELDS = (
+    "nextPageToken, newStartPageToken, "
+    "changes(fileId, removed, file(id, name, mimeType, md5Checksum, parents, createdTime, size, trashed))"
+)
+
+
+class InvalidPageToken(Exception):
+    """Raised when Drive rejects a stored changes page token."""
+
+
+def _load_state():
+    try:
+        if not os.path.exists(PAGE_TOKEN_FILE):
+            return {}
+        with open(PAGE_TOKEN_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Could not load {PAGE_TOKEN_FILE}: {e}")
+        return {}
+
+
+def load_page_token():
+    """Return the saved changes page token, or None on first run."""
+    return _load_state().get("page_token")
+
+
+def load_retry_items():
+    """Drive items whose download failed after the last token was saved."""
+    return _load_state().get("retry", [])
+
+
+def save_page_token(page_token, retry=()):
+    """
+    Persist the changes page token for the next sync, with the items
+    (retry) that failed to download in this one so the next sync tries
+    them again even though they are behind the token.
+    """
+    try:
+        tmp_path = PAGE_TOKEN_FILE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"page_token": page_token, "retry": list(retry)}, f)
+        os.replace(tmp_path, PAGE_TOKEN_FILE)
+    except Exception as e:
+        print(f"⚠️ Could not save {PAGE_TOKEN_FILE}: {e}")
+
+
+def get_start_page_token(service):
+    """Ask Drive for the token that marks 'now' in the changes feed."""
+    return service.changes().getStartPageToken().execute()["startPageToken"]
+
+
+def list_changed_images(service, folder_ids, page_token):
+    """
+    Walk the changes feed from page_token.
+    Returns (images, new_start_page_token) where images are new or modified
+    image files whose parent is one of folder_ids.
+    """
+    folders = set(folder_ids)
+    images = []
+
+    while True:
+        try:
+            with DRIVE_LIST_SECONDS.time(call="changes.list"):
+                results = service.changes().list(
+                    pageToken=page_token,
+                    pageSize=CHANGES_PAGE_SIZE,
+                    fields=CHANGES_FIELDS,
+                    spaces="drive"
+                ).execute()
+        except HttpError as e:
+            if e.resp.status in (400, 404, 410):
+                raise InvalidPageToken(str(e))
+            raise
+
+        for change in results.get("changes", []):
+            item = change.get("file")
+            if change.get("removed") or not item or item.get("trashed"):
+                continue
+            if not item.get("mimeType", "").startswith("image/"):
+                continue
+            if folders.isdisjoint(item.get("parents", [])):
+                continue
+            images.append(item)
+
+        if "newStartPageToken" in results:
+            return images, results["newStartPageToken"]
+        page_token = results["nextPageToken"]
+
+
+def new_images(service, folder_ids, full_scan):
+    """
+    Images that need syncing, and the page token to save once they have
+    been downloaded: returns (items, next_token).
+    Uses the changes feed (plus the items that failed last time) when a
+    valid page token is stored; otherwise items is full_scan() (an iterable
+    of Drive items) and next_token one taken before the scan. The caller
+    saves the token with save_page_token(), passing the items that failed,
+    only after every download has finished.
+    """
+    page_token = load_page_token()
+
+    if page_token:
+        try:
+            images, new_token = list_changed_images(service, folder_ids, page_token)
+        except InvalidPageToken as e:
+            print(f"⚠️ Drive page token rejected ({e}) — falling back to full re-list.")
+        else:
+            retry = load_retry_items()
+            print(f"🔁 Drive changes since last sync: {len(images)} image(s)"
+                  + (f", retrying {len(retry)} failed download(s)." if retry else "."))
+            return retry + images, new_token
+
+    # Take the token before listing so changes made during the scan are not lost
+    start_token = get_start_page_token(service)
+    print("📂 Running full Drive re-list...")
+    return full_scan(), start_token
@@ -1,47 +1,142 @@
 import os
-import requests
+import json
+import time
+import threading
+from http_client import get_session
+from pinterest_media import PINTEREST_API_BASE
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Get your access token
-access_token = os.getenv("PINTEREST_ACCESS_TOKEN")
+BOARDS_URL = f"{PINTEREST_API_BASE}/boards"
+# Board name → id lookups are cached on disk for this long
+BOARD_CACHE_FILE = os.getenv("BOARD_CACHE_FILE", "board_cache.json")
+BOARD_CACHE_TTL = int(os.getenv("BOARD_CACHE_TTL", 24 * 3600))
 
-if not access_token:
-    print("❌ PINTEREST_ACCESS_TOKEN not found in .env file")
-    exit(1)
 
-# Fetch all boards
-url = "https://api.pinterest.com/v5/boards"
-headers = {
-    "Authorization": f"Bearer {access_token}"
-}
+class BoardNotFound(Exception):
+    """Raised when a board name matches none of the account's boards."""
+
+
+def list_boards(access_token):
+    """Fetch all boards of the account (follows the bookmark pagination)."""
+    headers = {
+        "Authorization": f"Bearer {access_token}"
+    }
+    boards = []
+    bookmark = None
+
+    while True:
+        params = {"page_size": 100}
+        if bookmark:
+            params["bookmark"] = bookmark
+        response = get_session().get(BOARDS_URL, headers=headers, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to fetch boards: {response.status_code} {response.text}")
 
-try:
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
         data = response.json()
-        boards = data.get('items', [])
-        
+        boards.extend(data.get('items', []))
+        bookmark = data.get('bookmark')
+        if not bookmark:
+            return boards
+
+
+class BoardDirectory:
+    """
+    Resolves board names to ids. Values that are already numeric ids are
+    returned unchanged; names are looked up once and cached in memory and
+    in BOARD_CACHE_FILE so restarts don't list the boards again.
+    """
+
+    def __init__(self, path=BOARD_CACHE_FILE, ttl=BOARD_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._boards = None   # lowercased name -> id
+        self._fetched_at = 0
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._boards = data["boards"]
+            self._fetched_at = data["fetched_at"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Could not load {path}: {e}")
+
+    def _refresh(self, access_token):
+        boards = list_boards(access_token() if callable(access_token) else access_token)
+        self._boards = {board['name'].strip().lower(): board['id'] for board in boards}
+        self._fetched_at = time.time()
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": self._fetched_at, "boards": self._boards}, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ Could not save {self.path}: {e}")
+
+    def resolve(self, board, access_token):
+        """
+        Board id for a board name or id. access_token may be a callable,
+        called only when the boards have to be listed.
+        """
+        board = board.strip()
+        if board.isdigit():
+            return board
+
+        key = board.lower()
+        with self._lock:
+            stale = self._boards is None or time.time() - self._fetched_at > self.ttl
+            if stale or key not in self._boards:
+                # A board created since the last lookup also triggers a refresh
+                self._refresh(access_token)
+            if key not in self._boards:
+                raise BoardNotFound(f"No Pinterest board named {board!r}")
+            return self._boards[key]
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+def get_board_directory():
+    """Process-wide board name cache."""
+    global _directory
+    with _directory_lock:
+        if _directory is None:
+            _directory = BoardDirectory()
+        return _directory
+
+
+if __name__ == "__main__":
+    # Get your access token
+    access_token = os.getenv("PINTEREST_ACCESS_TOKEN")
+
+    if not access_token:
+        print("❌ PINTEREST_ACCESS_TOKEN not found in .env file")
+        exit(1)
+
+    try:
+        boards = list_boards(access_token)
+
         print("\n" + "="*60)
         print("📌 YOUR PINTEREST BOARDS:")
         print("="*60)
-        
+
         for board in boards:
             board_id = board.get('id')
             board_name = board.get('name')
             print(f"\n📋 Name: {board_name}")
             print(f"   ID: {board_id}")
-        
+
         print("\n" + "="*60)
         print("Copy the ID of the board you want to use and update your .env file:")
         print("PINTEREST_BOARD_ID=<paste_the_numeric_id_here>")
+        print("or route folders to boards by name with BOARD_ROUTES (see board_routing.py)")
         print("="*60 + "\n")
-    else:
-        print(f"❌ Failed to fetch boards: {response.status_code}")
-        print(f"Response: {response.text}")
 
-except Exception as e:
-    print(f"⚠️ Error: {e}")
\ No newline at end of file
+    except Exception as e:
+        print(f"⚠️ Error: {e}")
@@ -0,0 +1,57 @@
+# health_server.py
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from metrics import REGISTRY
+
+_started = time.time()
+_checks = {}
+_checks_lock = threading.Lock()
+
+
+def set_ready(name, ok=True):
+    """Record the state of one readiness check (e.g. "drive", "scheduler")."""
+    with _checks_lock:
+        _checks[name] = bool(ok)
+
+
+def readiness():
+    with _checks_lock:
+        checks = dict(_checks)
+    return bool(checks) and all(checks.values()), checks
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """/healthz (process alive), /readyz (all checks passing) and /metrics (Prometheus)."""
+
+    def _send(self, code, body, content_type="application/json"):
+        data = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/healthz":
+            self._send(200, json.dumps({"status": "ok", "uptime_s": round(time.time() - _started)}))
+        elif path == "/readyz":
+            ready, checks = readiness()
+            self._send(200 if ready else 503, json.dumps({"ready": ready, "checks": checks}))
+        elif path == "/metrics":
+            self._send(200, REGISTRY.render(), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send(404, json.dumps({"error": "not found"}))
+
+    def log_message(self, format, *args):
+        pass  # scrapes and health checks would flood the log
+
+
+def serve(port, host="0.0.0.0"):
+    """Run the health/metrics server on this thread (blocks)."""
+    server = ThreadingHTTPServer((host, port), HealthHandler)
+    server.daemon_threads = True
+    print(f"✅ Health and metrics server running on port {port}")
+    server.serve_forever()
@@ -0,0 +1,103 @@
+# http_client.py
+import os
+import time
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 10))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 60))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 3))
+HTTP_GZIP = os.getenv("HTTP_GZIP", "true").lower() in ("1", "true", "yes")
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session with a default timeout and per-request latency metrics.
+    Connections are kept alive and reused across calls to the same host.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Only idempotent methods are retried; POSTs (pins, OAuth) are never replayed here
+        retry = Retry(
+            total=HTTP_RETRIES,
+            backoff_factor=0.5,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+        self.mount("https://", self.adapter)
+        self.mount("http://", self.adapter)
+        self.headers["Accept-Encoding"] = "gzip, deflate" if HTTP_GZIP else "identity"
+
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        start = time.perf_counter()
+        status = "error"
+        try:
+            res = super().request(method, url, **kwargs)
+            status = res.status_code
+            return res
+        finally:
+            self._record(method, url, status, time.perf_counter() - start)
+
+    def _record(self, method, url, status, elapsed):
+        key = (method.upper(), urlparse(url).netloc)
+        with self._stats_lock:
+            entry = self._stats.setdefault(key, {"count": 0, "total": 0.0, "max": 0.0, "statuses": {}})
+            entry["count"] += 1
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+            entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+
+    def stats(self):
+        """Latency per (method, host) plus how many TCP connections each pool opened."""
+        with self._stats_lock:
+            requests_by_key = {
+                f"{method} {host}": dict(entry, avg=entry["total"] / entry["count"])
+                for (method, host), entry in self._stats.items()
+            }
+        connections = {}
+        pools = self.adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is not None:
+                connections[f"{pool_key.key_scheme}://{pool_key.key_host}"] = pool.num_connections
+        return {"requests": requests_by_key, "connections": connections}
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide pooled session shared by Pinterest, OAuth and board calls."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = PooledSession()
+        return _session
+
+
+def print_http_stats():
+    """Print request latency and connection reuse for this process."""
+    if _session is None:
+        return
+    stats = _session.stats()
+    if not stats["requests"]:
+        return
+    print("🌐 HTTP calls (count | avg | max):")
+    for key, entry in sorted(stats["requests"].items()):
+        print(f"   {key}: {entry['count']} | {entry['avg'] * 1000:.0f} ms | {entry['max'] * 1000:.0f} ms")
+    total_requests = sum(entry["count"] for entry in stats["requests"].values())
+    total_connections = sum(stats["connections"].values())
+    print(f"   🔌 {total_connections} connection(s) opened for {total_requests} request(s)")
@@ -0,0 +1,113 @@
+# image_prep.py
+import os
+import hashlib
+from download_cache import DOWNLOAD_DIR
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: without it JPEG and PNG are sent as-is
+    Image = None
+
+# Pinterest's recommended pin size is 1000x1500 (2:3); anything larger is downsized
+IMAGE_MAX_WIDTH = int(os.getenv("IMAGE_MAX_WIDTH", 1000))
+IMAGE_MAX_HEIGHT = int(os.getenv("IMAGE_MAX_HEIGHT", 1500))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 85))
+NORMALIZED_DIR = os.path.join(DOWNLOAD_DIR, "normalized")
+
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+
+# The only types Pinterest accepts for an image_base64 media source
+UPLOAD_TYPES = ("image/jpeg", "image/png")
+
+
+class UnsupportedImage(Exception):
+    """Raised when an image is in a format Pinterest won't take and can't be converted."""
+
+
+def sniff_content_type(path):
+    """Detect the real image type from magic bytes (extensions can lie)."""
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return "image/jpeg"
+
+
+def _cache_path(path, ext):
+    """Normalized files are keyed by source identity and the current settings."""
+    stat = os.stat(path)
+    key = f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}:{IMAGE_MAX_WIDTH}x{IMAGE_MAX_HEIGHT}:{IMAGE_QUALITY}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(NORMALIZED_DIR, f"{digest}{ext}")
+
+
+def forget_normalized(path):
+    """Delete the normalized copies (and keep-original markers) of a source file."""
+    for ext in (".jpg", ".png"):
+        out_path = _cache_path(path, ext)
+        for leftover in (out_path, out_path + ".original"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def normalize_image(path):
+    """
+    Return (path, content_type) of the file to upload, always JPEG or PNG.
+    Oversized images are downsized and recompressed once, and GIF, WEBP and
+    BMP files are converted (a GIF's first frame); the result is cached
+    under downloads/normalized. JPEGs and PNGs that would not shrink are
+    sent unchanged. Raises UnsupportedImage for other formats without Pillow.
+    """
+    content_type = sniff_content_type(path)
+    if Image is None:
+        if content_type not in UPLOAD_TYPES:
+            raise UnsupportedImage(f"{os.path.basename(path)} is {content_type}; "
+                                   "install Pillow to convert it to JPEG/PNG for Pinterest")
+        return path, content_type
+
+    # Images with transparency become PNG; everything else is shipped as JPEG
+    with Image.open(path) as img:
+        keep_png = content_type != "image/jpeg" and (
+            img.mode in ("RGBA", "LA") or "transparency" in img.info
+        )
+        ext, out_type = (".png", "image/png") if keep_png else (".jpg", "image/jpeg")
+
+        out_path = _cache_path(path, ext)
+        if os.path.exists(out_path):
+            return out_path, out_type
+        # Marker left when a previous pass found the original was already best
+        keep_marker = out_path + ".original"
+        if os.path.exists(keep_marker):
+            return path, content_type
+
+        img = ImageOps.exif_transpose(img)
+        oversized = img.width > IMAGE_MAX_WIDTH or img.height > IMAGE_MAX_HEIGHT
+        img.thumbnail((IMAGE_MAX_WIDTH, IMAGE_MAX_HEIGHT), Image.LANCZOS)
+
+        os.makedirs(NORMALIZED_DIR, exist_ok=True)
+        tmp_path = out_path + ".tmp"
+        if keep_png:
+            img.save(tmp_path, "PNG", optimize=True)
+        else:
+            img.convert("RGB").save(tmp_path, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+
+    original_size = os.path.getsize(path)
+    new_size = os.path.getsize(tmp_path)
+    if content_type in UPLOAD_TYPES and not oversized and new_size >= original_size:
+        os.remove(tmp_path)
+        open(keep_marker, "w").close()
+        return path, content_type
+
+    os.replace(tmp_path, out_path)
+    print(f"🪄 Normalized {os.path.basename(path)}: {original_size // 1024} KB → {new_size // 1024} KB")
+    return out_path, out_type
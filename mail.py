@@ -1,8 +1,13 @@
 import smtplib
 import os
+import time
+import queue
+import atexit
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
+from tracing import span
 
 load_dotenv()
 
@@ -12,6 +17,15 @@ SMTP_SERVER = os.getenv("SMTP_SERVER")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))  # ← DEFAULT FIX
 SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() not in ("0", "false", "no")
+
+# Queue notifications and send them from a background thread
+EMAIL_ASYNC = os.getenv("EMAIL_ASYNC", "true").lower() in ("1", "true", "yes")
+# Messages arriving within this many seconds are merged into one digest email
+EMAIL_DIGEST_WINDOW = float(os.getenv("EMAIL_DIGEST_WINDOW", 60))
+# An identical message is not re-sent within this many seconds, only counted
+EMAIL_DEDUP_WINDOW = float(os.getenv("EMAIL_DEDUP_WINDOW", 3600))
+SMTP_IDLE_TIMEOUT = 240  # close the shared connection after this long unused
 
 
 def send_test_email():
@@ -22,7 +36,7 @@ def send_test_email():
         msg["From"] = EMAIL_USER
         msg["To"] = EMAIL_RECEIVER
         msg["Subject"] = "Mailjet Test Email from DrivePinterestUploader"
-        
+
         body = (
             "This is a test email sent via Mailjet SMTP integration.\n\n"
             "If you're seeing this, your Mailjet credentials are working correctly!"
@@ -41,29 +55,214 @@ def send_test_email():
         print("❌ Email test failed:", e)
 
 
-def send_email_notification(subject, body):
-    """Send a notification email via Mailjet with proper UTF-8 encoding."""
+def _build_message(subject, body):
+    # Create MIME message with UTF-8 encoding
+    msg = MIMEMultipart()
+    msg["From"] = EMAIL_USER
+    msg["To"] = EMAIL_RECEIVER
+    msg["Subject"] = subject
+
+    # Attach body with UTF-8 encoding to support emojis
+    msg.attach(MIMEText(body, "plain", "utf-8"))
+    return msg
+
+
+class NotificationDispatcher:
+    """
+    Background sender for notification emails.
+    - keeps one authenticated SMTP connection open and reuses it
+    - merges messages that arrive within EMAIL_DIGEST_WINDOW into one digest
+    - sends an identical message at most once per EMAIL_DEDUP_WINDOW, counting repeats
+    - flushes whatever is queued when the process exits
+    """
+
+    _STOP = object()
+    _FLUSH = object()
+
+    def __init__(self, window=EMAIL_DIGEST_WINDOW, dedup_window=EMAIL_DEDUP_WINDOW):
+        self.window = window
+        self.dedup_window = dedup_window
+        self._queue = queue.Queue()
+        self._smtp = None
+        self._last_sent = {}     # (subject, body) -> time it was last emailed
+        self._suppressed = {}    # (subject, body) -> repeats held back since then
+        self._thread = threading.Thread(target=self._run, name="mail-dispatcher", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def submit(self, subject, body):
+        self._queue.put((subject, body))
+
+    def flush(self, timeout=30):
+        """Send everything queued so far, without waiting for the digest window."""
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        done.wait(timeout)
+
+    def shutdown(self, timeout=30):
+        if self._thread.is_alive():
+            self._queue.put((self._STOP, None))
+            self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            if batch:
+                timeout = max(0.0, deadline - time.monotonic())
+            else:
+                timeout = SMTP_IDLE_TIMEOUT if self._smtp else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                if batch:
+                    self._send_batch(batch)
+                    batch = []
+                else:
+                    self._close()
+                continue
+
+            if item[0] is self._STOP:
+                self._send_batch(batch)
+                self._close()
+                return
+            if item[0] is self._FLUSH:
+                self._send_batch(batch)
+                batch = []
+                item[1].set()
+                continue
+
+            if not batch:
+                deadline = time.monotonic() + self.window
+            batch.append(item)
+            if self.window <= 0:
+                self._send_batch(batch)
+                batch = []
+
+    def _send_batch(self, batch):
+        if not batch:
+            return
+        now = time.monotonic()
+
+        # Deduplicate within the batch and against recently sent messages
+        counts = {}
+        for item in batch:
+            counts[item] = counts.get(item, 0) + 1
+        fresh = []
+        for key, count in counts.items():
+            last = self._last_sent.get(key)
+            if last is not None and now - last < self.dedup_window:
+                self._suppressed[key] = self._suppressed.get(key, 0) + count
+                continue
+            repeats = count - 1 + self._suppressed.pop(key, 0)
+            fresh.append((key, repeats))
+        if not fresh:
+            return
+
+        if len(fresh) == 1:
+            (subject, body), repeats = fresh[0]
+            if repeats:
+                body += f"\n\n(repeated {repeats} more time(s))"
+        else:
+            subject = f"Pinterest bot digest: {len(fresh)} notifications"
+            sections = []
+            for (item_subject, item_body), repeats in fresh:
+                suffix = f" (x{repeats + 1})" if repeats else ""
+                sections.append(f"■ {item_subject}{suffix}\n{item_body}")
+            body = "\n\n".join(sections)
+
+        if self._deliver(subject, body):
+            for key, _ in fresh:
+                self._last_sent[key] = now
+
+    def _connection(self):
+        """Return the shared SMTP connection, reconnecting if it went stale."""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except Exception:
+                pass
+            self._close()
+
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+        if EMAIL_USE_TLS:
+            server.starttls()
+        if SMTP_USERNAME:
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        self._smtp = server
+        return server
+
+    def _deliver(self, subject, body):
+        msg = _build_message(subject, body)
+        for attempt in range(2):
+            try:
+                with span("email.send", attempt=attempt + 1):
+                    server = self._connection()
+                    server.sendmail(EMAIL_USER, EMAIL_RECEIVER, msg.as_string())
+                print(f"📧 Notification email sent: {subject}")
+                return True
+            except Exception as e:
+                self._close()
+                if attempt:
+                    print("❌ Failed to send notification email:", e)
+        return False
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Process-wide notification dispatcher, started on first use."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+        return _dispatcher
+
+
+def shutdown_dispatcher():
+    """Send whatever the dispatcher still holds and stop it (no-op if it never started)."""
+    with _dispatcher_lock:
+        dispatcher = _dispatcher
+    if dispatcher is not None:
+        dispatcher.shutdown()
+
+
+def send_email_now(subject, body):
+    """Send a notification email via Mailjet with proper UTF-8 encoding (blocking)."""
     try:
-        # Create MIME message with UTF-8 encoding
-        msg = MIMEMultipart()
-        msg["From"] = EMAIL_USER
-        msg["To"] = EMAIL_RECEIVER
-        msg["Subject"] = subject
-        
-        # Attach body with UTF-8 encoding to support emojis
-        msg.attach(MIMEText(body, "plain", "utf-8"))
-        
+        msg = _build_message(subject, body)
+
         # Connect to Mailjet SMTP
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
+        with span("email.send"), smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+            if EMAIL_USE_TLS:
+                server.starttls()
             server.login(SMTP_USERNAME, SMTP_PASSWORD)
             server.sendmail(EMAIL_USER, EMAIL_RECEIVER, msg.as_string())
-        
+
         print("📧 Notification email sent successfully!")
-        
+
     except Exception as e:
         print("❌ Failed to send notification email:", e)
 
 
+def send_email_notification(subject, body):
+    """Queue a notification email (or send it right away when EMAIL_ASYNC is off)."""
+    if EMAIL_ASYNC:
+        get_dispatcher().submit(subject, body)
+    else:
+        send_email_now(subject, body)
+
+
 if __name__ == "__main__":
-    send_test_email()
\ No newline at end of file
+    send_test_email()
@@ -1,27 +1,48 @@
+import time
+_IMPORT_STARTED = time.perf_counter()  # cold-start measurement (see record_startup_time)
 import os
 import io
 import base64
-import time
 import json
+import heapq
+import math
+import signal
 import requests
+import threading
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from urllib.parse import urlparse, parse_qs
-from datetime import datetime, time as dt_time
+from datetime import datetime
 import pytz
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from mail import send_email_notification
-from token_manager import refresh_and_update_env
+from mail import send_email_notification, shutdown_dispatcher
+from token_manager import get_access_token, get_token_provider, refresh_and_update_env
+from drive_sync import new_images, save_page_token
+from http_client import get_session, print_http_stats
+from metrics import (DRIVE_LIST_SECONDS, DRIVE_DOWNLOAD_SECONDS, DRIVE_DOWNLOADS, DRIVE_DOWNLOADED_BYTES, CACHE_BYTES,
+                     PIN_CREATE_SECONDS, PIN_CREATE_RESPONSES, PENDING_UPLOADS, PINS_TODAY, PINS_DAILY_LIMIT)
+from health_server import serve as serve_health, set_ready
+from tracing import run_trace, span, traced
+from pinterest_media import PINTEREST_API_BASE, STREAM_UPLOAD_MIN_BYTES, MediaSourceCache, MediaUploadError, stream_media_source
+from board_routing import get_board_router, history_key
+from image_prep import normalize_image
+from upload_scheduler import UPLOAD_WORKERS, send_with_rate_limit
+from upload_outbox import PIN_UNKNOWN, UploadOutbox
+from upload_queue import get_upload_queue
+from near_duplicates import get_duplicate_index
+from pipeline import Pipeline, Stage
+from post_scheduler import PostScheduler, parse_slot_times, spread_slots
+from upload_history import HISTORY_BACKEND, HISTORY_DB, LegacyNameMigration, get_history
+from upload_journal import SNAPSHOT_FILE
+from download_cache import (DOWNLOAD_DIR, cache_name, cache_path, is_known, is_cached, record_download, original_name,
+                            flush_index, touch, mark_posted, source_item, forget, cache_bytes)
+_IMPORTS_DONE = time.perf_counter()
 
 # =====================
-# Tracking file (persisted in repo)
+# Tracking file (persisted in repo; see upload_history.py / upload_journal.py)
 # =====================
-TRACK_FILE = "uploaded_files.json"
+TRACK_FILE = SNAPSHOT_FILE if HISTORY_BACKEND != "sqlite" else HISTORY_DB
 
 # =====================
 # Load environment
@@ -51,7 +72,6 @@ PIN_DESCRIPTION = (
 PIN_LINK = "https://youtube.com/@praveenrkalabhairava?feature=shared"
 
 TOKEN_FILE = "pinterest_token.json"
-DOWNLOAD_DIR = "downloads"
 LOG_DIR = "logs"
 UPLOADED_LOG = "uploaded_files.txt"   # kept for compatibility; not used for tracking now
 LAST_UPLOAD_DATE_FILE = "last_upload_date.txt"
@@ -63,119 +83,338 @@ os.makedirs(LOG_DIR, exist_ok=True)
 # =====================
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
-def connect_drive():
-    """Connect to Google Drive API (Render-compatible, no browser needed)."""
-    creds = None
-    token_data = os.getenv("GOOGLE_TOKEN_JSON")
+# Download engine settings
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", 4))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 8 * 1024 * 1024))  # bytes per request
 
+# Send the "Drive Connected" email (in the background) when connecting
+NOTIFY_ON_CONNECT = os.getenv("NOTIFY_ON_CONNECT", "false").lower() in ("1", "true", "yes")
+STARTUP_LOG = os.path.join(LOG_DIR, "startup_times.jsonl")
+
+# Credentials from connect_drive(), used to build one HTTP client per download worker
+_drive_credentials = None
+_drive_service = None
+_drive_lock = threading.Lock()
+_worker_state = threading.local()
+
+def record_startup_time():
+    """Append this process's cold-start latency (main import → Drive ready) to STARTUP_LOG."""
     try:
-        # ✅ Use token from environment if available (for Render)
-        if token_data:
-            creds = Credentials.from_authorized_user_info(json.loads(token_data), SCOPES)
-            print("🔐 Loaded Drive token from environment.")
-        # ✅ Otherwise, fall back to local token.json (for local testing)
-        elif os.path.exists("token.json"):
-            creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-            print("📁 Loaded Drive token from local file.")
-        else:
-            raise RuntimeError("❌ No Google Drive token found — run locally once to generate token.json")
+        entry = {
+            "at": datetime.now(pytz.utc).isoformat(timespec="seconds"),
+            "imports_s": round(_IMPORTS_DONE - _IMPORT_STARTED, 3),
+            "drive_ready_s": round(time.perf_counter() - _IMPORT_STARTED, 3),
+        }
+        with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"⏱️  Cold start: imports {entry['imports_s']}s, Drive ready after {entry['drive_ready_s']}s")
+    except Exception as e:
+        print(f"⚠️ Could not record startup time: {e}")
+
+def connect_drive():
+    """
+    Connect to Google Drive API (Render-compatible, no browser needed).
+    The service is built once per process from the discovery document bundled
+    with google-api-python-client (no discovery HTTP call) and then reused.
+    """
+    global _drive_credentials, _drive_service
 
-        # ✅ Refresh token if expired
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            print("🔁 Token refreshed successfully.")
+    with _drive_lock:
+        if _drive_service is not None:
+            return _drive_service
 
-        print("✅ Connected to Google Drive (Render-compatible).")
-        send_email_notification("Drive Connected", "✅ Successfully connected to Google Drive API.")
-        return build("drive", "v3", credentials=creds)
+        # Heavy Google client imports are deferred until Drive is actually needed
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
 
-    except Exception as e:
-        print(f"❌ Failed to connect to Google Drive: {e}")
-        send_email_notification("Drive Connection Failed", f"❌ Error: {e}")
+        creds = None
+        token_data = os.getenv("GOOGLE_TOKEN_JSON")
+
+        try:
+            # ✅ Use token from environment if available (for Render)
+            if token_data:
+                creds = Credentials.from_authorized_user_info(json.loads(token_data), SCOPES)
+                print("🔐 Loaded Drive token from environment.")
+            # ✅ Otherwise, fall back to local token.json (for local testing)
+            elif os.path.exists("token.json"):
+                creds = Credentials.from_authorized_user_file("token.json", SCOPES)
+                print("📁 Loaded Drive token from local file.")
+            else:
+                raise RuntimeError("❌ No Google Drive token found — run locally once to generate token.json")
+
+            # ✅ Refresh token if expired
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+                print("🔁 Token refreshed successfully.")
+
+            _drive_service = build("drive", "v3", credentials=creds, static_discovery=True, cache_discovery=False)
+            _drive_credentials = creds
+            set_ready("drive")
+
+            print("✅ Connected to Google Drive (Render-compatible).")
+            record_startup_time()
+            if NOTIFY_ON_CONNECT:
+                send_email_notification("Drive Connected", "✅ Successfully connected to Google Drive API.")
+            return _drive_service
+
+        except Exception as e:
+            set_ready("drive", False)
+            print(f"❌ Failed to connect to Google Drive: {e}")
+            send_email_notification("Drive Connection Failed", f"❌ Error: {e}")
+            raise
+
+# Drive caps files.list at 1000 results per page
+DRIVE_PAGE_SIZE = 1000
+DRIVE_LIST_FIELDS = "nextPageToken, files(id, name, mimeType, md5Checksum, parents, createdTime, size)"
+IMAGE_QUERY = "mimeType contains 'image/' and trashed=false"
+# Folders merged into one "'a' in parents or 'b' in parents" query
+FOLDERS_PER_QUERY = int(os.getenv("DRIVE_FOLDERS_PER_QUERY", 20))
+
+def _iter_files(service, query):
+    """Yield every file matching a Drive query, following nextPageToken."""
+    page_token = None
+
+    while True:
+        with span("drive.list_page") as page, DRIVE_LIST_SECONDS.time(call="files.list"):
+            results = service.files().list(
+                q=query,
+                fields=DRIVE_LIST_FIELDS,
+                pageSize=DRIVE_PAGE_SIZE,
+                pageToken=page_token
+            ).execute()
+            page.set(files=len(results.get('files', [])))
+
+        yield from results.get('files', [])
+
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+def iter_folder_images(service, folder_ids):
+    """
+    Yield images from several folders using combined parent queries.
+    If a combined query fails, its folders are retried one by one so the
+    error is reported against the folder that caused it.
+    The first complete listing also moves upload history entries written
+    under bare Drive names to the items' content keys (LegacyNameMigration).
+    The walk is timed as one drive.list_images span.
+    """
+    with span("drive.list_images", folders=len(folder_ids)) as listing:
+        try:
+            yield from _list_folder_images(service, folder_ids, listing)
+        except GeneratorExit:
+            # The consumer had enough (or was cancelled); not a listing error
+            listing.set(outcome="ok", stopped_early=True)
+            raise
+
+def _list_folder_images(service, folder_ids, listing):
+    counts = {folder_id: 0 for folder_id in folder_ids}
+    seen = set()
+    legacy = LegacyNameMigration(get_history())
+
+    for start in range(0, len(folder_ids), FOLDERS_PER_QUERY):
+        chunk = folder_ids[start:start + FOLDERS_PER_QUERY]
+        print(f"\n🔍 Checking {len(chunk)} folder(s): {', '.join(chunk)}")
+        parents = " or ".join(f"'{folder_id}' in parents" for folder_id in chunk)
+
+        try:
+            for item in _iter_files(service, f"({parents}) and {IMAGE_QUERY}"):
+                if item['id'] in seen:
+                    continue
+                seen.add(item['id'])
+                legacy.claim(item['name'], cache_name(item))
+                for parent in item.get('parents', []):
+                    if parent in counts:
+                        counts[parent] += 1
+                yield item
+        except Exception as e:
+            if len(chunk) == 1:
+                counts.pop(chunk[0], None)
+                print(f"⚠️ Error while processing Drive folder {chunk[0]}: {e}")
+                continue
+            print(f"⚠️ Combined folder query failed ({e}) — retrying folders one by one.")
+        else:
+            continue
+
+        for folder_id in chunk:
+            try:
+                for item in _iter_files(service, f"'{folder_id}' in parents and {IMAGE_QUERY}"):
+                    if item['id'] in seen:
+                        continue
+                    seen.add(item['id'])
+                    legacy.claim(item['name'], cache_name(item))
+                    counts[folder_id] += 1
+                    yield item
+            except Exception as e:
+                counts.pop(folder_id, None)
+                print(f"⚠️ Error while processing Drive folder {folder_id}: {e}")
+
+    for folder_id, found in counts.items():
+        print(f"🖼️  Image files found in {folder_id}: {found}")
+    listing.set(images=len(seen), failed_folders=len(folder_ids) - len(counts))
+    # Folders that failed to list may still hold files posted under their old names
+    if len(counts) == len(folder_ids):
+        legacy.finish()
+
+def _worker_http():
+    """Return this thread's authorized client (httplib2 is not thread-safe)."""
+    http = getattr(_worker_state, "http", None)
+    if http is None:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        http = AuthorizedHttp(_drive_credentials, http=httplib2.Http())
+        _worker_state.http = http
+    return http
+
+def _download_file(request, file_path, chunk_size, own_http):
+    """Fetch one file in chunks; write to a .part file so partial downloads never look complete."""
+    from googleapiclient.http import MediaIoBaseDownload
+
+    if own_http:
+        request.http = _worker_http()
+
+    part_path = file_path + ".part"
+    started = time.perf_counter()
+    try:
+        with span("drive.download", file=os.path.basename(file_path)) as download:
+            with io.FileIO(part_path, 'wb') as fh:
+                downloader = MediaIoBaseDownload(fh, request, chunksize=chunk_size)
+                done = False
+                while not done:
+                    status, done = downloader.next_chunk(num_retries=3)
+            os.replace(part_path, file_path)
+            download.set(bytes=os.path.getsize(file_path))
+    except Exception:
+        DRIVE_DOWNLOADS.inc(outcome="failed")
+        if os.path.exists(part_path):
+            os.remove(part_path)
         raise
+    DRIVE_DOWNLOAD_SECONDS.observe(time.perf_counter() - started)
+    DRIVE_DOWNLOADS.inc(outcome="ok")
+    DRIVE_DOWNLOADED_BYTES.inc(os.path.getsize(file_path))
+    return file_path
 
-def list_images(service, folder_id):
-    """List images in a Drive folder."""
-    print(f"\n🔍 Checking folder: {folder_id}")
-    
-    results = service.files().list(
-        q=f"'{folder_id}' in parents and mimeType contains 'image/' and trashed=false",
-        fields="files(id, name, mimeType)"
-    ).execute()
-    
-    images = results.get('files', [])
-    print(f"🖼️  Image files found: {len(images)}")
-    
-    return images
+@traced("drive.download_images")
+def download_images(service, items, workers=None, chunk_size=None, failed=None):
+    """
+    Download new images from Drive (items may be a list or a lazy iterator).
+    Files run concurrently on `workers` threads, each with its own Drive
+    client; without credentials from connect_drive() they run one by one.
+    Files are stored content-addressed (see download_cache), so the same
+    bytes listed in several folders are fetched once, and anything downloaded
+    before is skipped even if it has since been evicted from the cache.
+    Items whose download fails are appended to `failed` when it is a list.
+    """
+    workers = workers or DOWNLOAD_WORKERS
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    own_http = _drive_credentials is not None
 
-def download_images(service, items):
-    """Download new images from Drive."""
     downloaded = []
     skipped = 0
-    
-    for item in items:
-        name = item['name']
-        file_path = os.path.join(DOWNLOAD_DIR, name)
-        
-        if os.path.exists(file_path):
-            skipped += 1
-            continue
-            
-        request = service.files().get_media(fileId=item['id'])
-        with io.FileIO(file_path, 'wb') as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-        downloaded.append(file_path)
-        print(f"📥 Downloaded: {name}")
-    
+    failures = []
+    claimed = set()
+
+    def collect(futures):
+        for future, item in futures:
+            try:
+                downloaded.append(future.result())
+                record_download(item)
+                queue_image(item)
+                print(f"📥 Downloaded: {item['name']}")
+            except Exception as e:
+                failures.append(item)
+                print(f"⚠️ Download failed for {item['name']}: {e}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}
+
+        for item in items:
+            file_path = cache_path(item)
+
+            if file_path in claimed or is_known(item):
+                skipped += 1
+                continue
+            claimed.add(file_path)
+
+            # Requests are built here; only their execution moves to the workers
+            request = service.files().get_media(fileId=item['id'])
+
+            future = pool.submit(_download_file, request, file_path, chunk_size, own_http)
+            in_flight[future] = item
+
+            # Keep a bounded window so a huge listing doesn't queue every file at once.
+            # A shared client allows only one request at a time, listing included.
+            if len(in_flight) >= (workers * 2 if own_http else 1):
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect([(future, in_flight.pop(future)) for future in done])
+
+        done, _ = wait(in_flight)
+        collect([(future, in_flight.pop(future)) for future in done])
+
+    flush_index()
+
     if skipped > 0:
         print(f"⏭️  Skipped {skipped} already downloaded files")
-    
+    if failures:
+        print(f"⚠️  {len(failures)} downloads failed")
+    if failed is not None:
+        failed.extend(failures)
+
     return downloaded
 
+def queue_image(item):
+    """Add a downloaded image to the upload queue and hash it for near-duplicate checks."""
+    get_upload_queue(FOLDER_IDS).push(cache_name(item), item.get('parents', []), item.get('createdTime'))
+    with span("image.dhash", file=cache_name(item)):
+        get_duplicate_index().hash_file(cache_path(item))
+
+def fetch_image(service, item):
+    """
+    Download one Drive image into the cache (no-op when it is on disk) and
+    return its path. Safe to call from several threads once connect_drive()
+    has provided credentials for per-thread clients.
+    """
+    file_path = cache_path(item)
+    if is_cached(item):
+        touch(cache_name(item))
+        return file_path
+
+    request = service.files().get_media(fileId=item['id'])
+    _download_file(request, file_path, DOWNLOAD_CHUNK_SIZE, _drive_credentials is not None)
+    record_download(item)
+    queue_image(item)
+    print(f"📥 Downloaded: {item['name']}")
+    return file_path
+
 # =====================
-# Tracking helpers (persist in uploaded_files.json)
+# Tracking helpers (persist in the journal or uploaded_files.db; see upload_history.py)
 # =====================
 def load_uploaded_list():
-    """Return a set of filenames already uploaded (from TRACK_FILE)."""
+    """Return a set of file keys already uploaded."""
     try:
-        if not os.path.exists(TRACK_FILE):
-            return set()
-        with open(TRACK_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            uploaded = data.get("uploaded", [])
-            return set(uploaded)
+        return get_history().keys()
     except Exception as e:
-        print(f"⚠️ Could not load {TRACK_FILE}: {e}")
+        print(f"⚠️ Could not load upload history: {e}")
         return set()
 
 def save_uploaded_list(uploaded_set):
-    """Save the set of uploaded filenames into TRACK_FILE (sorted list for readability)."""
+    """Record every key in uploaded_set (kept for compatibility; prefer mark_as_uploaded)."""
     try:
-        data = {"uploaded": sorted(list(uploaded_set))}
-        with open(TRACK_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        history = get_history()
+        for filename in uploaded_set:
+            history.add(filename)
     except Exception as e:
-        print(f"⚠️ Could not save {TRACK_FILE}: {e}")
+        print(f"⚠️ Could not save upload history: {e}")
 
 # =====================
 # Pinterest OAuth & Upload
 # =====================
 def get_pinterest_token():
-    """Always load access token from environment or refresh with refresh token."""
-    access_token = os.getenv("PINTEREST_ACCESS_TOKEN")
-    refresh_token = os.getenv("PINTEREST_REFRESH_TOKEN")
-
-    # If we already have access token, return it
-    if access_token:
-        return access_token
-
-    # If no access token but refresh token exists → refresh
-    if refresh_token:
-        print("🔄 No access token found — refreshing using refresh token...")
-        return refresh_and_update_env()
+    """Return the cached access token; token_manager refreshes it when missing or about to expire."""
+    token = get_access_token()
+    if token:
+        return token
 
     print("❌ No Pinterest tokens found! Add this to .env:")
     print("PINTEREST_REFRESH_TOKEN=your_refresh_token")
@@ -198,7 +437,7 @@ def refresh_pinterest_token(token_data=None):
         "client_secret": APP_SECRET,
     }
 
-    res = requests.post(url, data=data)
+    res = get_session().post(url, data=data)
     response = res.json()
 
     if "access_token" in response:
@@ -247,7 +486,7 @@ def pinterest_auth():
                     "client_id": APP_ID,
                     "client_secret": APP_SECRET,
                 }
-                res = requests.post(token_url, data=data)
+                res = get_session().post(token_url, data=data)
                 token_json = res.json()
                 
                 # Save to file
@@ -274,22 +513,34 @@ def pinterest_auth():
     server = HTTPServer(("localhost", 8080), Handler)
     server.handle_request()
 
-# Replace local-file tracking with TRACK_FILE-based tracking
-def is_uploaded(filename):
-    """Check if filename exists in uploaded_files.json (persistent)."""
+# Upload history lookups hit the in-memory index of upload_history
+def is_uploaded(filename, board_id=None):
+    """
+    Check the upload history: for one board when board_id is given, otherwise
+    whether the file is on every board its Drive folder is routed to. A
+    routed board that can't be resolved right now counts as not uploaded.
+    """
     try:
-        uploaded = load_uploaded_list()
-        return filename in uploaded
-    except:
+        history = get_history()
+        if board_id:
+            return history_key(filename, board_id) in history
+        boards, unresolved = get_board_router().resolve_file(filename)
+        return bool(boards) and not unresolved and all(history_key(filename, board) in history for board in boards)
+    except Exception:
         return False
 
-def mark_as_uploaded(filename):
-    """Add filename to uploaded_files.json (persistent)."""
+def boards_to_post(filename):
+    """Resolved boards the file still has to go to (unresolved ones are retried later)."""
+    return [board_id for board_id in get_board_router().boards_for_file(filename)
+            if not is_uploaded(filename, board_id)]
+
+def mark_as_uploaded(filename, pin_id=None, board_id=None):
+    """Add filename to the upload history (persistent), with the image's dhash for near-duplicate checks."""
     try:
-        uploaded = load_uploaded_list()
-        if filename not in uploaded:
-            uploaded.add(filename)
-            save_uploaded_list(uploaded)
+        # filename is a history key: the cached file, plus "@<board id>" for extra boards
+        value = get_duplicate_index().hash_file(os.path.join(DOWNLOAD_DIR, filename.split("@", 1)[0]))
+        get_history().add(filename, pin_id=pin_id, board_id=board_id,
+                          dhash=None if value is None else f"{value:016x}")
     except Exception as e:
         print(f"⚠️ mark_as_uploaded error: {e}")
 
@@ -322,92 +573,327 @@ def update_upload_count(count):
     with open(LAST_UPLOAD_DATE_FILE, 'w') as f:
         json.dump({'date': today, 'count': count}, f)
 
-def upload_to_pinterest(image_path):
-    """Upload image to Pinterest (v5 JSON format)."""
+def build_media_source(token, image_path, shared=False):
+    """
+    Normalize the image, then inline it as base64 if small; files of
+    STREAM_UPLOAD_MIN_BYTES or more, and images going to several boards
+    (shared), are uploaded once through the /v5/media flow instead. An image
+    whose media upload fails is inlined after all.
+    """
+    with span("image.normalize", file=os.path.basename(image_path)):
+        upload_path, content_type = normalize_image(image_path)
+    size = os.path.getsize(upload_path)
+
+    if shared or size >= STREAM_UPLOAD_MIN_BYTES:
+        try:
+            with span("pinterest.stream_media", bytes=size):
+                return stream_media_source(token, upload_path, content_type)
+        except MediaUploadError as e:
+            print(f"⚠️ Media upload failed for {os.path.basename(image_path)} ({e}) — sending it inline.")
+
+    with span("pinterest.encode", bytes=size):
+        with open(upload_path, "rb") as img_file:
+            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+
+    return {
+        "source_type": "image_base64",
+        "content_type": content_type,
+        "data": img_base64
+    }
+
+def pin_marker(filename):
+    """Private pin note that ties a pin back to its file key (used to detect duplicates)."""
+    return f"drive-key:{filename}"
+
+def find_existing_pin(filename, pages=3, board_id=None):
+    """
+    Return the id of a pin on the board (default BOARD_ID) already carrying
+    this file's marker, None if there is none, or PIN_UNKNOWN if Pinterest
+    couldn't be asked (the caller must not assume the pin is missing).
+    """
+    board_id = board_id or BOARD_ID
+    token = get_pinterest_token()
+    if not token:
+        return PIN_UNKNOWN
+    marker = pin_marker(filename)
+    bookmark = None
+    try:
+        for _ in range(pages):
+            params = {"page_size": 100}
+            if bookmark:
+                params["bookmark"] = bookmark
+            res = get_session().get(
+                f"{PINTEREST_API_BASE}/boards/{board_id}/pins",
+                headers={"Authorization": f"Bearer {token}"},
+                params=params,
+                timeout=30
+            )
+            if res.status_code != 200:
+                print(f"⚠️ Could not check existing pins for {filename} ({res.status_code})")
+                return PIN_UNKNOWN
+            data = res.json()
+            for pin in data.get("items", []):
+                if pin.get("note") == marker:
+                    return pin.get("id")
+            bookmark = data.get("bookmark")
+            if not bookmark:
+                return None
+    except Exception as e:
+        print(f"⚠️ Could not check existing pins for {filename}: {e}")
+        return PIN_UNKNOWN
+    return None
+
+# Media built for an image is reused for each board it goes to (see send_uploads)
+_media_sources = MediaSourceCache()
+
+def attempt_upload(image_path, board_id=None):
+    """
+    Upload image to Pinterest (v5 JSON format) on one board (default BOARD_ID).
+    Returns {"ok", "retry", "maybe_posted", "error"} so the outbox can tell
+    transient failures (timeouts, 5xx, 429) from permanent ones, and knows
+    when a failed attempt may still have created the pin.
+    """
+    board_id = board_id or BOARD_ID
+    with span("pinterest.upload", file=os.path.basename(image_path), board=board_id) as upload:
+        result = _attempt_upload(image_path, board_id)
+        if result.get("skipped"):
+            upload.set(outcome="skipped")
+        elif not result.get("ok"):
+            upload.set(outcome="failed", error=result.get("error"))
+        return result
+
+def _attempt_upload(image_path, board_id):
     filename = os.path.basename(image_path)
 
-    if is_uploaded(filename):
-        print(f"⏭️  Already uploaded: {filename}")
-        return True
+    if is_uploaded(filename, board_id):
+        print(f"⏭️  Already uploaded: {filename} (board {board_id})")
+        return {"ok": True, "skipped": True}
 
-    print(f"📸 Uploading {filename} to Pinterest...")
+    print(f"📸 Uploading {original_name(filename)} ({filename}) to Pinterest board {board_id}...")
 
     # ----------------------------------------------------------
     # 🔐 STEP 1 — Get token (may auto-refresh if expired)
     # ----------------------------------------------------------
     token = get_pinterest_token()
 
-    # If still no token → force a refresh using Render API
     if not token:
-        print("❌ No valid token — forcing refresh via Render...")
-        from token_manager import refresh_and_update_env
-        token = refresh_and_update_env()
-
-        if not token:
-            print("❌ Could not refresh token. Upload aborted.")
-            return False
+        print("❌ Could not get a Pinterest token. Upload aborted.")
+        return {"ok": False, "retry": False, "error": "no_access_token"}
     
     # ----------------------------------------------------------
     # 🖼️ STEP 2 — Prepare upload request
     # ----------------------------------------------------------
     try:
-        url = "https://api.pinterest.com/v5/pins"
+        url = f"{PINTEREST_API_BASE}/pins"
         headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json"
         }
 
-        with open(image_path, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-
+        shared = len(get_board_router().boards_for_file(filename)) > 1
         payload = {
-            "board_id": BOARD_ID,
+            "board_id": board_id,
             "title": PIN_TITLE,
             "description": PIN_DESCRIPTION,
             "link": PIN_LINK,
-            "media_source": {
-                "source_type": "image_base64",
-                "content_type": "image/jpeg",
-                "data": img_base64
-            }
+            "note": pin_marker(filename),
+            "media_source": _media_sources.get(image_path, lambda: build_media_source(token, image_path, shared))
         }
 
-        res = requests.post(url, headers=headers, json=payload)
+        def post():
+            status = "error"
+            try:
+                with span("pinterest.post") as call, PIN_CREATE_SECONDS.time():
+                    res = get_session().post(url, headers=headers, json=payload, timeout=(10, 120))
+                    call.set(status=res.status_code, outcome="ok" if res.status_code < 400 else "failed")
+                status = res.status_code
+                return res
+            finally:
+                PIN_CREATE_RESPONSES.inc(status=status)
+
+        res = send_with_rate_limit(post)
 
         # ----------------------------------------------------------
         # ⚠️ STEP 3 — If token expired → auto-refresh and RETRY once
         # ----------------------------------------------------------
         if res.status_code == 401:
             print("🔄 Token expired during upload — refreshing...")
-            from token_manager import refresh_and_update_env
-            token = refresh_and_update_env()
+            # Threads that hit the same 401 share a single refresh
+            token = refresh_and_update_env(stale_token=token)
 
             if token:
                 headers["Authorization"] = f"Bearer {token}"
-                res = requests.post(url, headers=headers, json=payload)
+                res = send_with_rate_limit(post)
 
         # After retry:
         if res.status_code in (200, 201):
             print(f"✅ Uploaded successfully: {filename}")
-            mark_as_uploaded(filename)
-            return True
-        else:
-            print(f"❌ Upload failed ({res.status_code}): {res.text}")
-            return False
-
+            try:
+                pin_id = res.json().get("id")
+            except ValueError:
+                pin_id = None
+            mark_as_uploaded(history_key(filename, board_id), pin_id=pin_id, board_id=board_id)
+            return {"ok": True}
+
+        print(f"❌ Upload failed ({res.status_code}): {res.text}")
+        error = f"http_{res.status_code}"
+        if res.status_code >= 500:
+            # The server may have created the pin before failing
+            return {"ok": False, "retry": True, "maybe_posted": True, "error": error}
+        return {"ok": False, "retry": res.status_code == 429, "error": error}
+
+    except requests.exceptions.ConnectTimeout as e:
+        print(f"⚠️ Upload error for {filename}: {e}")
+        return {"ok": False, "retry": True, "error": f"connect_timeout: {e}"}
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        print(f"⚠️ Upload error for {filename}: {e}")
+        return {"ok": False, "retry": True, "maybe_posted": True, "error": f"{type(e).__name__}: {e}"}
+    except MediaUploadError as e:
+        print(f"⚠️ Upload error for {filename}: {e}")
+        return {"ok": False, "retry": True, "error": str(e)}
     except Exception as e:
         print(f"⚠️ Upload error for {filename}: {e}")
-        return False
+        return {"ok": False, "retry": False, "error": str(e)}
 
-def get_pending_uploads():
-    """Get list of downloaded files that haven't been uploaded yet."""
-    pending = []
-    if os.path.exists(DOWNLOAD_DIR):
-        for filename in sorted(os.listdir(DOWNLOAD_DIR)):
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                if not is_uploaded(filename):
-                    pending.append(os.path.join(DOWNLOAD_DIR, filename))
-    return pending
+def upload_to_pinterest(image_path, board_id=None):
+    """Upload image to Pinterest once; True on success."""
+    return attempt_upload(image_path, board_id)["ok"]
+
+def already_posted(image_path, board_id=None):
+    """Outbox check for jobs that may have gone through: record and return the existing pin id."""
+    filename = os.path.basename(image_path)
+    board_id = board_id or BOARD_ID
+    pin_id = find_existing_pin(filename, board_id=board_id)
+    if pin_id and pin_id is not PIN_UNKNOWN:
+        mark_as_uploaded(history_key(filename, board_id), pin_id=pin_id, board_id=board_id)
+    return pin_id
+
+def enqueue_targets(outbox, path):
+    """Queue one outbox job per board the image still has to go to; returns the job keys."""
+    filename = os.path.basename(path)
+    keys = []
+    for board_id in boards_to_post(filename):
+        key = history_key(filename, board_id)
+        outbox.enqueue(key, path, board_id)
+        keys.append(key)
+    return keys
+
+def restore_evicted(paths):
+    """
+    Download pending files that were evicted from the cache again (only
+    unposted files are ever fetched twice) and mark all of them as used.
+    Returns the paths that are on disk.
+    """
+    # Touch everything first so fetching one file can't evict another of these
+    for path in paths:
+        touch(os.path.basename(path))
+    ready = []
+    service = None
+    for path in paths:
+        filename = os.path.basename(path)
+        if not os.path.exists(path):
+            item = source_item(filename)
+            if item is None:
+                print(f"⚠️ {filename} is missing and has no Drive id to fetch it from; dropping it.")
+                forget(filename)
+                continue
+            try:
+                service = service or connect_drive()
+                fetch_image(service, item)
+            except Exception as e:
+                print(f"⚠️ Could not fetch evicted {original_name(filename)} again: {e}")
+                continue
+        ready.append(path)
+    return ready
+
+def retire(filename):
+    """A file is on all its boards: take it off the upload queue and let the cache evict it first."""
+    mark_posted(filename)
+    get_upload_queue(FOLDER_IDS).remove(filename)
+    get_duplicate_index().add_posted(filename)
+
+def retire_duplicate(filename, match, distance):
+    """Skip a near-duplicate of a posted image for good, and report it."""
+    print(f"🪞 Skipping {original_name(filename)}: near-duplicate of posted "
+          f"{original_name(match)} (distance {distance})")
+    get_duplicate_index().record_duplicate(filename, match, distance)
+    mark_posted(filename)
+    get_upload_queue(FOLDER_IDS).remove(filename)
+
+def release_posted(paths):
+    """Retire the files that are now on all their boards."""
+    for path in paths:
+        filename = os.path.basename(path)
+        if is_uploaded(filename):
+            retire(filename)
+
+def send_uploads(paths):
+    """
+    Post images through the durable outbox, one pin per routed board, with
+    each image's media built once and shared by its boards. Failures are
+    retried with jittered backoff inside this run and left queued for the
+    next one. Returns the number of images that got at least one new pin.
+    """
+    paths = restore_evicted(paths)
+    outbox = UploadOutbox()
+    targets = {path: enqueue_targets(outbox, path) for path in paths}
+    keys = [key for path_keys in targets.values() for key in path_keys]
+
+    try:
+        pins = outbox.drain(keys, attempt_upload, already_posted)
+    finally:
+        _media_sources.forget(paths)
+        release_posted(paths)
+        flush_index()
+
+    history = get_history()
+    posted = sum(1 for path_keys in targets.values() if any(key in history for key in path_keys))
+    if pins != posted:
+        print(f"📌 {pins} pins created for {posted} images")
+    return posted
+
+def get_pending_uploads(limit=None):
+    """
+    The next `limit` downloaded files to upload (all when None), in upload
+    queue order (UPLOAD_QUEUE_POLICY). Files evicted from the download cache
+    are included; send_uploads() fetches them again. Near-duplicates of
+    posted images are retired, and near-duplicates of an image earlier in
+    the list wait for a later call (by then it is posted and they are retired).
+    Files whose remaining boards can't be resolved right now stay queued.
+    """
+    queue = get_upload_queue(FOLDER_IDS)
+    duplicates = get_duplicate_index()
+    held = set()
+    while True:
+        names = queue.peek(None if limit is None else limit + len(held))
+        picked = []
+        changed = False
+        for filename in names:
+            if filename in held:
+                continue
+            if is_uploaded(filename):
+                # Posted before the queue tracked it (or by another process)
+                retire(filename)
+                changed = True
+                continue
+            if not boards_to_post(filename):
+                # Only boards that can't be resolved right now are left; keep it queued
+                held.add(filename)
+                changed = True
+                continue
+            # Hashed when downloaded; files cached by older versions are hashed here
+            duplicates.hash_file(os.path.join(DOWNLOAD_DIR, filename))
+            match = duplicates.find_match(filename, picked)
+            if match and match[2]:
+                retire_duplicate(filename, match[0], match[1])
+                changed = True
+            elif match:
+                held.add(filename)
+                changed = True
+            else:
+                picked.append(filename)
+        if not changed:
+            return [os.path.join(DOWNLOAD_DIR, filename) for filename in picked]
 
 def post_to_pinterest(access_token, max_pins=None):
     """
@@ -421,6 +907,7 @@ def post_to_pinterest(access_token, max_pins=None):
 
     # Ensure upload functions that call get_pinterest_token() pick this token:
     os.environ["PINTEREST_ACCESS_TOKEN"] = access_token
+    get_token_provider().set_token(access_token)
 
     if max_pins is None:
         try:
@@ -428,208 +915,306 @@ def post_to_pinterest(access_token, max_pins=None):
         except Exception:
             max_pins = 3
 
-    pending = get_pending_uploads()
-    if not pending:
+    duplicates_before = get_duplicate_index().found
+    to_upload = get_pending_uploads(max_pins)
+    skipped = get_duplicate_index().found - duplicates_before
+    if not to_upload:
         print("📭 No pending images to upload.")
-        return {"posted": 0}
-
-    to_upload = pending[:max_pins]
-    success = 0
-    for img in to_upload:
-        ok = upload_to_pinterest(img)
-        if ok:
-            success += 1
-        # small delay to avoid hammering the API
-        time.sleep(1)
-
-    summary = {"posted": success, "attempted": len(to_upload)}
+        return {"posted": 0, "duplicates": skipped}
+
+    # Concurrent, paced by the shared rate-limit bucket, retried through the outbox
+    success = send_uploads(to_upload)
+
+    summary = {"posted": success, "attempted": len(to_upload), "duplicates": skipped}
     print(f"✅ post_to_pinterest summary: {summary}")
     return summary
 
+# Download every Drive image before choosing what to post (the original behaviour).
+# Off by default: only the images picked for today are fetched.
+DRIVE_PREFETCH = os.getenv("DRIVE_PREFETCH", "false").lower() in ("1", "true", "yes")
+
+def select_candidates(items, history, limit=None):
+    """
+    The Drive images not yet on all their boards and not already found to
+    be near-duplicates, oldest (by createdTime) first; the first `limit`
+    of them when given.
+    """
+    router = get_board_router()
+    duplicates = get_duplicate_index()
+    keys = set()
+    fresh = []
+    for item in items:
+        key = cache_name(item)
+        if duplicates.is_duplicate(key):
+            continue
+        boards = router.boards_for_folders(item.get('parents', []))
+        if not boards or all(history_key(key, board) in history for board in boards):
+            continue
+        if key in keys or item.get('size') == "0":
+            continue
+        keys.add(key)
+        fresh.append(item)
+    order = lambda item: (item.get('createdTime', ''), item['name'])
+    if limit is None:
+        return sorted(fresh, key=order)
+    return heapq.nsmallest(limit, fresh, key=order)
+
+# Per-stage concurrency for the run_daily_uploads pipeline
+NORMALIZE_WORKERS = int(os.getenv("NORMALIZE_WORKERS", 2))
+
+def build_upload_pipeline(service, limit):
+    """
+    download → normalize → upload stages for run_daily_uploads. Images that
+    are already in the upload history, or near-duplicates of a posted image
+    or of one taken earlier in this run, are dropped before normalizing, and
+    at most `limit` images are handed to the upload stage.
+    """
+    own_http = _drive_credentials is not None
+    outbox = UploadOutbox()
+    duplicates = get_duplicate_index()
+    claimed = set()
+    accepted = []
+    lock = threading.Lock()
+    taken = 0
+
+    def download(item):
+        # The same content listed in two folders shares one cache file
+        with lock:
+            if cache_path(item) in claimed:
+                return None
+            claimed.add(cache_path(item))
+        return fetch_image(service, item)
+
+    def normalize(path):
+        nonlocal taken
+        filename = os.path.basename(path)
+        if is_uploaded(filename):
+            retire(filename)
+            return None
+        if not boards_to_post(filename):
+            return None
+        duplicates.hash_file(path)
+        with lock:
+            if taken >= limit:
+                return None
+            match = duplicates.find_match(filename, accepted)
+            if not match:
+                taken += 1
+                accepted.append(filename)
+        if match:
+            if match[2]:
+                retire_duplicate(filename, match[0], match[1])
+            return None
+        # Prepared copies are cached, so build_media_source() reuses this work
+        normalize_image(path)
+        return path
+
+    def upload(path):
+        keys = enqueue_targets(outbox, path)
+        try:
+            posted = outbox.drain(keys, attempt_upload, already_posted, workers=1)
+        finally:
+            _media_sources.forget([path])
+            release_posted([path])
+        return path if posted else None
+
+    return Pipeline([
+        Stage("download", download, workers=DOWNLOAD_WORKERS if own_http else 1),
+        Stage("normalize", normalize, workers=NORMALIZE_WORKERS),
+        Stage("upload", upload, workers=UPLOAD_WORKERS),
+    ])
+
 # New helper used by the cron-job approach that gets a fresh access token and runs a one-shot upload
+@run_trace("daily")
 def run_daily_uploads(access_token):
     """
-    One-shot run: downloads drive images, selects up to MAX_PINS_PER_DAY
-    that are not in uploaded_files.json, uploads them and updates the track file.
+    One-shot run: uploads up to MAX_PINS_PER_DAY drive images that are not in
+    the upload history and updates the track file. Candidates are fetched
+    oldest first, just as many as are still needed: one dropped as a
+    near-duplicate is replaced by the next (with DRIVE_PREFETCH everything
+    is downloaded). Listing, downloading, normalizing and uploading overlap
+    in a bounded pipeline (see pipeline.py).
     """
     if not access_token:
         print("❌ No access token provided to run_daily_uploads(). Aborting.")
         return {"posted": 0, "error": "no_access_token"}
 
     os.environ["PINTEREST_ACCESS_TOKEN"] = access_token
+    get_token_provider().set_token(access_token)
 
-    # Load uploaded history
-    uploaded_files = load_uploaded_list()
+    # Checked live: listing the folders may add keys (see LegacyNameMigration)
+    history = get_history()
 
     # Connect to Drive
     service = connect_drive()
 
-    # Download images from all configured folders
-    all_downloads = []
-    for folder_id in FOLDER_IDS:
-        try:
-            items = list_images(service, folder_id)
-            downloaded = download_images(service, items)
-            all_downloads.extend(downloaded)
-        except Exception as e:
-            print(f"⚠️ Error while processing Drive folder {folder_id}: {e}")
-
-    # Filter pending (not in uploaded_files)
-    pending = []
-    for path in sorted(all_downloads):
-        name = os.path.basename(path)
-        if name not in uploaded_files:
-            pending.append(path)
-
-    to_upload = pending[:MAX_PINS_PER_DAY]
-    print(f"📌 {len(to_upload)} images to upload this run (limit {MAX_PINS_PER_DAY}).")
-
-    posted = 0
-    for img in to_upload:
-        ok = upload_to_pinterest(img)
-        if ok:
-            posted += 1
-            # mark_as_uploaded() already updates TRACK_FILE
-        time.sleep(1)
-
-    print(f"✅ run_daily_uploads finished. Posted: {posted}")
-    return {"posted": posted}
-
-def is_posting_time():
-    """Check if current time matches the scheduled posting time."""
-    tz = pytz.timezone(TIMEZONE)
-    now = datetime.now(tz)
-    
-    # Parse POST_TIME (format: HH:MM)
-    post_hour, post_minute = map(int, POST_TIME.split(':'))
-    post_time = dt_time(post_hour, post_minute)
-    current_time = now.time()
-    
-    # Check if within 5 minutes of posting time
-    time_diff = abs((current_time.hour * 60 + current_time.minute) - 
-                    (post_time.hour * 60 + post_time.minute))
-    
-    return time_diff <= 5
+    if DRIVE_PREFETCH:
+        # Every image in every folder is downloaded; listing pages stream straight in
+        items = iter_folder_images(service, FOLDER_IDS)
+    else:
+        # Choose from Drive metadata, then fetch only what will be posted today
+        items = select_candidates(iter_folder_images(service, FOLDER_IDS), history)
+        print(f"🎯 {len(items)} candidates on Drive; fetching the oldest as needed.")
 
-def wait_until_post_time():
-    """Calculate time to wait until next posting time."""
-    tz = pytz.timezone(TIMEZONE)
-    now = datetime.now(tz)
-    
-    post_hour, post_minute = map(int, POST_TIME.split(':'))
-    
-    # Create posting time for today
-    post_datetime = now.replace(hour=post_hour, minute=post_minute, second=0, microsecond=0)
-    
-    # If posting time has passed today, schedule for tomorrow
-    if now >= post_datetime:
-        from datetime import timedelta
-        post_datetime += timedelta(days=1)
-    
-    time_diff = (post_datetime - now).total_seconds()
-    return time_diff
+    print(f"📌 Uploading up to {MAX_PINS_PER_DAY} images this run.")
+
+    # mark_as_uploaded() already updates the history; pacing comes from the rate-limit bucket
+    duplicates_before = get_duplicate_index().found
+    pipeline = build_upload_pipeline(service, MAX_PINS_PER_DAY)
+    try:
+        if DRIVE_PREFETCH:
+            posted = len(pipeline.run(items))
+        else:
+            # Feed as many candidates as images are still wanted, again until enough were taken
+            normalized = pipeline.stage("normalize")
+            posted = 0
+            while items and normalized.passed < MAX_PINS_PER_DAY:
+                wanted = MAX_PINS_PER_DAY - normalized.passed
+                posted += len(pipeline.run(items[:wanted]))
+                items = items[wanted:]
+    finally:
+        flush_index()
+    skipped = get_duplicate_index().found - duplicates_before
+
+    print(f"✅ run_daily_uploads finished. Posted: {posted}"
+          + (f", skipped {skipped} near-duplicates" if skipped else ""))
+    print_http_stats()
+    return {"posted": posted, "duplicates": skipped}
 
 # =====================
 # Automation Loop
 # =====================
-CHECK_INTERVAL = 60 * 5  # Check every 5 minutes
+# Comma-separated HH:MM slots; otherwise POST_SLOTS slots spread from POST_WINDOW_START to POST_TIME
+POST_TIMES = os.getenv("POST_TIMES", "")
+POST_WINDOW_START = os.getenv("POST_WINDOW_START", "10:00")
+POST_SLOTS = int(os.getenv("POST_SLOTS", MAX_PINS_PER_DAY))
+# Use the Drive changes feed instead of re-listing every folder each tick
+INCREMENTAL_SYNC = os.getenv("DRIVE_INCREMENTAL_SYNC", "true").lower() in ("1", "true", "yes")
+
+def post_slot_times():
+    """Daily post slots as sorted (hour, minute) tuples."""
+    if POST_TIMES.strip():
+        return parse_slot_times(POST_TIMES)
+    return spread_slots(POST_WINDOW_START, POST_TIME, POST_SLOTS)
+
+def sync_drive_images(service):
+    """Download new Drive images, incrementally when INCREMENTAL_SYNC is on."""
+    if not INCREMENTAL_SYNC:
+        return download_images(service, iter_folder_images(service, FOLDER_IDS))
+
+    items, next_token = new_images(service, FOLDER_IDS, lambda: iter_folder_images(service, FOLDER_IDS))
+    failed = []
+    downloaded = download_images(service, items, failed=failed)
+    # Failed items are behind the new token, so they are kept with it for the next sync
+    save_page_token(next_token, retry=failed)
+    return downloaded
+
+def run_post_slot(slots_due=1, slots_left=1):
+    """
+    Post this slot's share of today's remaining quota: slots_due of the
+    slots_left slots still open today (more than one when catching up).
+    """
+    today_count = get_today_upload_count()
+    remaining_pins = MAX_PINS_PER_DAY - today_count
+
+    if remaining_pins <= 0:
+        print(f"✋ Already uploaded {MAX_PINS_PER_DAY} images today. Will resume tomorrow.")
+        return
+
+    quota = math.ceil(remaining_pins * slots_due / max(slots_left, 1))
+    duplicates_before = get_duplicate_index().found
+    to_upload = get_pending_uploads(quota)
+    skipped = get_duplicate_index().found - duplicates_before
+    if not to_upload:
+        print("📭 No pending images to upload.")
+        return
+
+    print(f"\n⏰ Posting time! Uploading {len(to_upload)} images...")
+
+    successful_uploads = send_uploads(to_upload)
+
+    new_count = today_count + successful_uploads
+    update_upload_count(new_count)
+
+    summary = (f"✅ Uploaded {successful_uploads} images to Pinterest.\n"
+               f"Today's total: {new_count}/{MAX_PINS_PER_DAY}")
+    if skipped:
+        summary += f"\nSkipped {skipped} near-duplicates of posted images."
+    print(f"\n{summary}")
+    send_email_notification("Daily Upload Complete", summary)
+    print_http_stats()
+
+# Backlog and quota gauges are computed when /metrics is scraped
+PENDING_UPLOADS.set_function(lambda: len(get_upload_queue(FOLDER_IDS)))
+PINS_TODAY.set_function(get_today_upload_count)
+PINS_DAILY_LIMIT.set(MAX_PINS_PER_DAY)
+CACHE_BYTES.set_function(cache_bytes)
 
 def main_loop():
-    """Main automation loop with scheduled posting."""
+    """Main automation loop: post slots and Drive sync driven by PostScheduler."""
+    slots = post_slot_times()
+    slot_list = ", ".join(f"{hour:02d}:{minute:02d}" for hour, minute in slots)
+
     print("----- Starting Pinterest Automation -----")
-    print(f"📅 Schedule: Upload {MAX_PINS_PER_DAY} pins daily at {POST_TIME} {TIMEZONE}")
+    print(f"📅 Schedule: Upload {MAX_PINS_PER_DAY} pins daily at {slot_list} {TIMEZONE}")
     send_email_notification("Automation Started", 
                            f"🚀 Pinterest automation started.\n"
-                           f"Schedule: {MAX_PINS_PER_DAY} pins per day at {POST_TIME} {TIMEZONE}")
+                           f"Schedule: {MAX_PINS_PER_DAY} pins per day at {slot_list} {TIMEZONE}")
     
     try:
         drive_service = connect_drive()
         pinterest_auth()
-        
-        print(f"🔄 Bot will check for new images every 5 minutes and upload at scheduled time.\n")
-        
-        while True:
-            try:
-                # Download new images from Drive
-                new_images = []
-                for folder_id in FOLDER_IDS:
-                    items = list_images(drive_service, folder_id)
-                    downloaded = download_images(drive_service, items)
-                    new_images.extend(downloaded)
-
-                if new_images:
-                    print(f"📥 Downloaded {len(new_images)} new images.")
-                
-                # Check if it's posting time
-                if is_posting_time():
-                    today_count = get_today_upload_count()
-                    remaining_slots = MAX_PINS_PER_DAY - today_count
-                    
-                    if remaining_slots > 0:
-                        pending_uploads = get_pending_uploads()
-                        
-                        if pending_uploads:
-                            to_upload = pending_uploads[:remaining_slots]
-                            print(f"\n⏰ Posting time! Uploading {len(to_upload)} images...")
-                            
-                            successful_uploads = 0
-                            for img in to_upload:
-                                if upload_to_pinterest(img):
-                                    successful_uploads += 1
-                                    time.sleep(2)  # Small delay between uploads
-                            
-                            new_count = today_count + successful_uploads
-                            update_upload_count(new_count)
-                            
-                            summary = (f"✅ Uploaded {successful_uploads} images to Pinterest.\n"
-                                     f"Today's total: {new_count}/{MAX_PINS_PER_DAY}")
-                            print(f"\n{summary}")
-                            send_email_notification("Daily Upload Complete", summary)
-                        else:
-                            print("📭 No pending images to upload.")
-                    else:
-                        print(f"✋ Already uploaded {MAX_PINS_PER_DAY} images today. Will resume tomorrow.")
-                else:
-                    pending_count = len(get_pending_uploads())
-                    today_count = get_today_upload_count()
-                    
-                    tz = pytz.timezone(TIMEZONE)
-                    current_time = datetime.now(tz).strftime('%H:%M:%S')
-                    
-                    print(f"⏳ [{current_time}] Waiting for posting time ({POST_TIME})")
-                    print(f"   📊 Pending: {pending_count} | Uploaded today: {today_count}/{MAX_PINS_PER_DAY}")
-                
-                print(f"💤 Sleeping for 5 minutes...\n")
-                time.sleep(CHECK_INTERVAL)
 
-            except Exception as e:
-                error_msg = f"Error in main loop: {str(e)}"
-                print(f"⚠️ {error_msg}")
-                send_email_notification("Automation Error", error_msg)
-                print(f"🕒 Retrying in 5 minutes...")
-                time.sleep(CHECK_INTERVAL)
-                
+        def post(slots_due, slots_left):
+            with run_trace("post"):
+                run_post_slot(slots_due, slots_left)
+
+        @run_trace("sync")
+        def sync():
+            new_images = sync_drive_images(drive_service)
+            if new_images:
+                print(f"📥 Downloaded {len(new_images)} new images.")
+            print(f"   📊 Pending: {len(get_upload_queue(FOLDER_IDS))} | "
+                  f"Uploaded today: {get_today_upload_count()}/{MAX_PINS_PER_DAY}")
+            return len(new_images)
+
+        def report(job, error):
+            send_email_notification("Automation Error", f"Error in scheduled {job} job: {error}")
+
+        set_ready("scheduler")
+        PostScheduler(slots, TIMEZONE, post, sync, on_error=report).run()
+
     except Exception as e:
+        set_ready("scheduler", False)
         critical_error = f"Critical error during startup: {str(e)}"
         print(f"❌ {critical_error}")
         send_email_notification("Critical Automation Error", critical_error)
         raise
 
+def install_sigterm_handler():
+    """
+    Hosts like Render stop the service with SIGTERM, whose default handler
+    exits without running atexit hooks: send queued notifications first.
+    The process then exits at once, as before (the main loop thread would
+    otherwise keep it alive).
+    """
+    def on_sigterm(signum, frame):
+        print("🛑 SIGTERM received — sending queued notifications before exiting.")
+        shutdown_dispatcher()
+        os._exit(0)
+    signal.signal(signal.SIGTERM, on_sigterm)
+
 if __name__ == "__main__":
+    install_sigterm_handler()
     try:
         # Run your Pinterest automation loop
         from threading import Thread
         t = Thread(target=main_loop)
         t.start()
 
-        # 🟢 Keep-alive mini web server (so Render detects a port)
-        from http.server import SimpleHTTPRequestHandler, HTTPServer
-        import socket
-
+        # 🟢 Health/metrics server (also keeps Render's port check happy)
         PORT = int(os.environ.get("PORT", 10000))
-        with HTTPServer(("0.0.0.0", PORT), SimpleHTTPRequestHandler) as httpd:
-            print(f"✅ Keep-alive server running on port {PORT}")
-            httpd.serve_forever()
+        serve_health(PORT)
 
     except Exception as e:
         print(f"❌ Critical error during startup: {e}")
@@ -0,0 +1,172 @@
+# metrics.py
+import time
+import threading
+from contextlib import contextmanager
+
+# Seconds; covers a quick metadata call up to a slow multi-MB transfer
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        """Compute the (unlabelled) value when metrics are scraped."""
+        self._function = function
+
+    def render(self):
+        if self._function is not None:
+            try:
+                self.set(self._function())
+            except Exception as e:
+                print(f"⚠️ Could not compute {self.name}: {e}")
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][i] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the with-block took (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, dict(entry, counts=list(entry["counts"]))) for key, entry in self._values.items())
+        for key, entry in items:
+            for bound, count in zip(self.buckets, entry["counts"]):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [le])} {count}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry['sum'])}")
+            lines.append(f"{self.name}_count{labels} {entry['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Drive
+DRIVE_LIST_SECONDS = REGISTRY.register(Histogram(
+    "pinbot_drive_list_seconds", "Latency of one Drive listing page.", ["call"]))
+DRIVE_DOWNLOAD_SECONDS = REGISTRY.register(Histogram(
+    "pinbot_drive_download_seconds", "Time to download one file from Drive."))
+DRIVE_DOWNLOADS = REGISTRY.register(Counter(
+    "pinbot_drive_downloads_total", "Drive file downloads by outcome.", ["outcome"]))
+DRIVE_DOWNLOADED_BYTES = REGISTRY.register(Counter(
+    "pinbot_drive_downloaded_bytes_total", "Bytes downloaded from Drive."))
+CACHE_BYTES = REGISTRY.register(Gauge(
+    "pinbot_download_cache_bytes", "Bytes of downloaded images on disk."))
+CACHE_EVICTIONS = REGISTRY.register(Counter(
+    "pinbot_download_cache_evictions_total", "Files removed to keep the download cache in budget."))
+
+NEAR_DUPLICATES = REGISTRY.register(Counter(
+    "pinbot_near_duplicates_total", "Images skipped as near-duplicates of a posted image."))
+
+# Pinterest
+PIN_CREATE_SECONDS = REGISTRY.register(Histogram(
+    "pinbot_pin_create_seconds", "Latency of POST /v5/pins."))
+PIN_CREATE_RESPONSES = REGISTRY.register(Counter(
+    "pinbot_pin_create_responses_total", "POST /v5/pins responses by HTTP status.", ["status"]))
+TOKEN_REFRESHES = REGISTRY.register(Counter(
+    "pinbot_token_refreshes_total", "Pinterest access token refreshes by outcome.", ["outcome"]))
+
+# Backlog and quota (computed at scrape time by main.py)
+PENDING_UPLOADS = REGISTRY.register(Gauge(
+    "pinbot_pending_uploads", "Downloaded images not yet posted to all their boards."))
+PINS_TODAY = REGISTRY.register(Gauge(
+    "pinbot_pins_today", "Images posted today."))
+PINS_DAILY_LIMIT = REGISTRY.register(Gauge(
+    "pinbot_pins_daily_limit", "MAX_PINS_PER_DAY."))
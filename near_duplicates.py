@@ -0,0 +1,311 @@
+# near_duplicates.py
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from download_cache import DOWNLOAD_DIR, original_name, posted_files
+from metrics import NEAR_DUPLICATES
+from upload_history import get_history
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow nothing is hashed and nothing is skipped
+    Image = None
+
+try:
+    import numpy as np
+except ImportError:  # optional: ChunkIndex below is used instead
+    np = None
+
+# Local cache of the hashes; the hashes of posted images are also kept on their
+# upload history records (committed by the GitHub Actions cron), so a fresh
+# checkout is seeded from those. Images posted before hashes were recorded
+# are only compared against while they are still in the download cache.
+DUPLICATE_DB = "near_duplicates.db"
+# Differing bits (of 64) at which two images count as the same artwork; -1 turns the check off
+DUPLICATE_MAX_DISTANCE = int(os.getenv("DUPLICATE_MAX_DISTANCE", 6))
+
+
+def dhash(path, size=8):
+    """
+    64-bit difference hash: the image (first frame) is shrunk to 9x8 grey
+    pixels and each bit says whether a pixel is brighter than its right
+    neighbour. Re-exports, recompression and resizing barely change it.
+    Returns None if the file can't be read as an image.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as img:
+            pixels = list(img.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    except Exception as e:
+        print(f"⚠️ Could not hash {os.path.basename(path)}: {e}")
+        return None
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class ChunkIndex:
+    """
+    Pigeonhole index: the 64 bits are split into max_distance + 1 chunks,
+    and two hashes within max_distance of each other must agree exactly on
+    at least one chunk. A query only compares the entries sharing a chunk
+    with it (a few hundred per 100k hashes) instead of all of them.
+    """
+
+    def __init__(self, max_distance):
+        chunks = min(max(max_distance, 0) + 1, 64)
+        widths = [64 // chunks + (n < 64 % chunks) for n in range(chunks)]
+        self._spans = []
+        shift = 0
+        for width in widths:
+            self._spans.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables = [{} for _ in self._spans]
+        self.values = []
+        self.names = []
+
+    def add(self, value, name):
+        position = len(self.values)
+        self.values.append(value)
+        self.names.append(name)
+        for table, (shift, mask) in zip(self._tables, self._spans):
+            table.setdefault((value >> shift) & mask, []).append(position)
+
+    def nearest(self, value, max_distance):
+        """(name, distance) of the closest entry within max_distance, or None."""
+        best = None
+        seen = set()
+        for table, (shift, mask) in zip(self._tables, self._spans):
+            for position in table.get((value >> shift) & mask, ()):
+                if position in seen:
+                    continue
+                seen.add(position)
+                distance = hamming(value, self.values[position])
+                if distance <= max_distance and (best is None or distance < best[1]):
+                    best = (self.names[position], distance)
+        return best
+
+
+class HashArray:
+    """Hashes in a growable uint64 array; a query is one vectorized XOR + popcount."""
+
+    _POPCOUNT = None
+
+    def __init__(self):
+        if HashArray._POPCOUNT is None:
+            HashArray._POPCOUNT = np.array([bin(n).count("1") for n in range(256)], dtype=np.uint8)
+        self.values = np.zeros(1024, dtype=np.uint64)
+        self.names = []
+
+    def add(self, value, name):
+        if len(self.names) == len(self.values):
+            self.values = np.concatenate([self.values, np.zeros(len(self.values), dtype=np.uint64)])
+        self.values[len(self.names)] = value
+        self.names.append(name)
+
+    def nearest(self, value, max_distance):
+        count = len(self.names)
+        if not count:
+            return None
+        xor = np.bitwise_xor(self.values[:count], np.uint64(value))
+        if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+            distances = np.bitwise_count(xor)
+        else:
+            distances = self._POPCOUNT[xor.view(np.uint8)].reshape(count, 8).sum(axis=1)
+        best = int(distances.argmin())
+        if distances[best] > max_distance:
+            return None
+        return self.names[best], int(distances[best])
+
+
+class DuplicateIndex:
+    """
+    Perceptual hashes of downloaded images, computed once and kept in
+    SQLite, plus a search structure over the hashes of posted images
+    (NumPy when installed, otherwise ChunkIndex). Images found to
+    duplicate a posted one are recorded so they are never considered again.
+    """
+
+    def __init__(self, db_path=DUPLICATE_DB, max_distance=DUPLICATE_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                file_name TEXT PRIMARY KEY,
+                dhash     TEXT NOT NULL,
+                posted    INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS duplicates (
+                file_name TEXT PRIMARY KEY,
+                match     TEXT NOT NULL,
+                distance  INTEGER NOT NULL,
+                found_at  TEXT NOT NULL
+            );
+        """)
+        self._hashes = {}
+        self._unreadable = set()
+        self._posted = set()
+        self._search = HashArray() if np is not None else ChunkIndex(max_distance)
+        for name, value, posted in self._conn.execute("SELECT file_name, dhash, posted FROM hashes"):
+            if not value:
+                self._unreadable.add(name)
+                continue
+            self._hashes[name] = int(value, 16)
+            if posted:
+                self._posted.add(name)
+                self._search.add(self._hashes[name], name)
+        self._duplicates = {row[0] for row in self._conn.execute("SELECT file_name FROM duplicates")}
+        self.found = 0  # duplicates recorded by this process
+
+    @property
+    def enabled(self):
+        return self.max_distance >= 0 and Image is not None
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def hash_file(self, path):
+        """Hash an image unless it already has been; returns the hash (None if unreadable)."""
+        name = os.path.basename(path)
+        with self._lock:
+            if name in self._hashes or name in self._unreadable:
+                return self._hashes.get(name)
+        if not self.enabled or not os.path.exists(path):
+            return None
+        value = dhash(path)
+        with self._lock, self._conn:
+            # Unreadable files are stored with an empty hash so they aren't retried
+            self._conn.execute("INSERT OR IGNORE INTO hashes (file_name, dhash) VALUES (?, ?)",
+                               (name, "" if value is None else f"{value:016x}"))
+            if value is None:
+                self._unreadable.add(name)
+            else:
+                self._hashes[name] = value
+        return value
+
+    def add_posted(self, file_name):
+        """Make a posted image searchable, so later copies of it are caught."""
+        with self._lock:
+            value = self._hashes.get(file_name)
+            if value is None or file_name in self._posted:
+                return
+            with self._conn:
+                self._conn.execute("UPDATE hashes SET posted = 1 WHERE file_name = ?", (file_name,))
+            self._posted.add(file_name)
+            self._search.add(value, file_name)
+
+    def add_posted_hashes(self, hashes):
+        """Make posted images searchable from {file name: dhash hex} (e.g. the upload history's)."""
+        added = 0
+        with self._lock, self._conn:
+            for file_name, value in hashes.items():
+                if file_name in self._posted:
+                    continue
+                self._conn.execute("INSERT OR REPLACE INTO hashes (file_name, dhash, posted) VALUES (?, ?, 1)",
+                                   (file_name, value))
+                self._unreadable.discard(file_name)
+                self._hashes[file_name] = int(value, 16)
+                self._posted.add(file_name)
+                self._search.add(self._hashes[file_name], file_name)
+                added += 1
+        return added
+
+    def find_match(self, file_name, batch=()):
+        """
+        (match, distance, posted) for the closest posted image, or else the
+        closest image among `batch` (file names picked earlier in the same
+        run), within max_distance. None if there is none or no hash.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._hashes.get(file_name)
+            if value is None:
+                return None
+            found = self._search.nearest(value, self.max_distance)
+            if found and found[0] != file_name:
+                return found[0], found[1], True
+            best = None
+            for other in batch:
+                other_value = self._hashes.get(other)
+                if other == file_name or other_value is None:
+                    continue
+                distance = hamming(value, other_value)
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (other, distance, False)
+            return best
+
+    def record_duplicate(self, file_name, match, distance):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO duplicates (file_name, match, distance, found_at) VALUES (?, ?, ?, ?)",
+                (file_name, match, distance, datetime.now(timezone.utc).isoformat(timespec="seconds"))
+            )
+            self._duplicates.add(file_name)
+            self.found += 1
+        NEAR_DUPLICATES.inc()
+
+    def is_duplicate(self, file_name):
+        with self._lock:
+            return file_name in self._duplicates
+
+    def duplicates(self):
+        """Recorded duplicates, newest first, as dicts."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_name, match, distance, found_at FROM duplicates ORDER BY found_at DESC").fetchall()
+        return [dict(zip(("file_name", "match", "distance", "found_at"), row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_duplicate_index():
+    """
+    Process-wide duplicate index, opened on first use. A new index first
+    hashes the posted images still in the download cache; the hashes
+    recorded in the upload history are then added to it.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DuplicateIndex()
+            if not len(_index) and _index.enabled:
+                names = posted_files()
+                for name in names:
+                    if _index.hash_file(os.path.join(DOWNLOAD_DIR, name)) is not None:
+                        _index.add_posted(name)
+                if names:
+                    print(f"🔢 Hashed {len(names)} posted images for near-duplicate checks.")
+            # History keys are file names, with "@<board id>" for extra boards
+            hashes = {key.split("@", 1)[0]: value for key, value in get_history().dhashes().items()}
+            loaded = _index.add_posted_hashes(hashes)
+            if loaded:
+                print(f"🔢 Loaded {loaded} posted image hashes from the upload history.")
+        return _index
+
+
+if __name__ == "__main__":
+    index = get_duplicate_index()
+    found = index.duplicates()
+    print(f"{len(index)} images hashed, {len(found)} near-duplicates skipped "
+          f"(DUPLICATE_MAX_DISTANCE={index.max_distance}, {'NumPy' if np is not None else 'chunk index'} search)")
+    for entry in found:
+        print(f"  {entry['found_at']}  {original_name(entry['file_name'])} ≈ "
+              f"{original_name(entry['match'])} (distance {entry['distance']})")
@@ -0,0 +1,180 @@
+# pinterest_media.py
+"""
+Pinterest v5 media registration flow for large images: POST /v5/media
+registers an upload, the file is streamed to the returned upload_url, and
+GET /v5/media/{id} is polled until it is processed. The pin then uses an
+image_url source whose URL is the Location header of the upload response;
+when the upload response has none, MediaUploadError is raised and the
+caller sends the image inline as base64 instead.
+"""
+import io
+import os
+import time
+import uuid
+import threading
+from http_client import get_session
+
+PINTEREST_API_BASE = os.getenv("PINTEREST_API_BASE", "https://api.pinterest.com/v5")
+
+# Files at least this large are streamed through POST /v5/media instead of inline base64
+STREAM_UPLOAD_MIN_BYTES = int(os.getenv("STREAM_UPLOAD_MIN_BYTES", 5 * 1024 * 1024))
+MEDIA_POLL_INTERVAL = 2     # seconds between media status checks
+MEDIA_POLL_TIMEOUT = 120    # give up waiting for media processing after this long
+
+
+class MediaUploadError(Exception):
+    """Raised when any step of the media registration flow fails."""
+
+
+class MultipartFileStream:
+    """
+    multipart/form-data body that reads the file from disk while it is sent.
+    Exposes read() and __len__ so requests sends a Content-Length and streams
+    the body instead of building it in memory.
+    """
+
+    def __init__(self, fields, file_field, file_path, content_type, chunk_size=64 * 1024):
+        self.boundary = uuid.uuid4().hex
+        self.chunk_size = chunk_size
+
+        head = b""
+        for name, value in fields.items():
+            head += (
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode("utf-8")
+        head += (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{file_field}"; '
+            f'filename="{os.path.basename(file_path)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+        self._length = len(head) + os.path.getsize(file_path) + len(tail)
+        self._parts = [io.BytesIO(head), open(file_path, "rb"), io.BytesIO(tail)]
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        out = b""
+        while self._parts and len(out) < size:
+            data = self._parts[0].read(size - len(out))
+            if data:
+                out += data
+            else:
+                self._parts.pop(0).close()
+        return out
+
+    def __iter__(self):
+        while True:
+            data = self.read(self.chunk_size)
+            if not data:
+                break
+            yield data
+
+    def close(self):
+        for part in self._parts:
+            part.close()
+        self._parts = []
+
+
+def register_media(token):
+    """POST /v5/media — returns {media_id, upload_url, upload_parameters}."""
+    res = get_session().post(
+        f"{PINTEREST_API_BASE}/media",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"media_type": "image"},
+        timeout=30
+    )
+    if res.status_code not in (200, 201):
+        raise MediaUploadError(f"media registration failed ({res.status_code}): {res.text}")
+    return res.json()
+
+
+def upload_media_file(registration, file_path, content_type):
+    """Stream the file to the pre-signed upload URL; returns the stored object's URL."""
+    params = registration.get("upload_parameters", {})
+    body = MultipartFileStream(params, "file", file_path, content_type)
+    try:
+        res = get_session().post(
+            registration["upload_url"],
+            data=body,
+            headers={"Content-Type": body.content_type},
+            timeout=(10, 300)
+        )
+    finally:
+        body.close()
+
+    if res.status_code not in (200, 201, 204):
+        raise MediaUploadError(f"media upload failed ({res.status_code}): {res.text}")
+
+    # The upload URL itself is a pre-signed bucket address, not one Pinterest fetches images from
+    location = res.headers.get("Location")
+    if not location:
+        raise MediaUploadError(f"media upload returned no Location for media {registration.get('media_id')}")
+    return location
+
+
+def wait_for_media(token, media_id):
+    """Poll GET /v5/media/{id} until Pinterest has processed the upload."""
+    deadline = time.time() + MEDIA_POLL_TIMEOUT
+    while True:
+        res = get_session().get(
+            f"{PINTEREST_API_BASE}/media/{media_id}",
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=30
+        )
+        status = res.json().get("status") if res.status_code == 200 else None
+        if status == "succeeded":
+            return
+        if status == "failed" or time.time() > deadline:
+            raise MediaUploadError(f"media {media_id} not ready (status={status}, http={res.status_code})")
+        time.sleep(MEDIA_POLL_INTERVAL)
+
+
+def stream_media_source(token, file_path, content_type):
+    """
+    Register, stream and confirm a media upload.
+    Returns the media_source block for POST /v5/pins.
+    """
+    registration = register_media(token)
+    media_id = registration["media_id"]
+    media_url = upload_media_file(registration, file_path, content_type)
+    wait_for_media(token, media_id)
+    print(f"📤 Streamed {os.path.basename(file_path)} as media {media_id}")
+    return {"source_type": "image_url", "url": media_url}
+
+
+class MediaSourceCache:
+    """
+    media_source blocks shared by every board an image is posted to.
+    The first board to need one builds it (normalize + encode or stream);
+    boards posting the same image at the same time wait for it and reuse it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # path -> {"lock", "source"}
+
+    def get(self, path, build):
+        """Return the cached media_source for path, calling build() once if missing."""
+        with self._lock:
+            entry = self._entries.setdefault(path, {"lock": threading.Lock(), "source": None})
+        with entry["lock"]:
+            if entry["source"] is None:
+                entry["source"] = build()
+            return entry["source"]
+
+    def forget(self, paths):
+        with self._lock:
+            for path in paths:
+                self._entries.pop(path, None)
@@ -0,0 +1,143 @@
+# pipeline.py
+import os
+import time
+import queue
+import threading
+
+# Items buffered between two stages; a full queue blocks the stage feeding it
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 4))
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline step: func(item) returns the item for the next stage, or None to drop it."""
+
+    def __init__(self, name, func, workers=1, queue_size=PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy = 0.0
+
+    @property
+    def passed(self):
+        """Items this stage handed on (kept, for the last stage), over every run."""
+        return self.processed - self.dropped
+
+
+class Pipeline:
+    """
+    Streams items through stages running on their own threads, linked by
+    bounded queues, so Drive and Pinterest network time overlap and memory
+    stays flat however long the source is.
+
+    cancel() stops the source and makes every stage skip items it has not
+    started; work already in progress (e.g. an upload and its history
+    write) runs to completion, so nothing is left half-recorded.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        return next(stage for stage in self.stages if stage.name == name)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self, source):
+        """Feed source through every stage; returns the last stage's results."""
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results = []
+        remaining = [stage.workers for stage in self.stages]
+        started = time.perf_counter()
+
+        def feed():
+            try:
+                for item in source:
+                    if self.cancelled:
+                        break
+                    queues[0].put(item)
+            except Exception as e:
+                print(f"⚠️ Pipeline source failed: {e}")
+            finally:
+                for _ in range(self.stages[0].workers):
+                    queues[0].put(_DONE)
+
+        def work(index):
+            stage = self.stages[index]
+            inbox = queues[index]
+            last = index == len(self.stages) - 1
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                if self.cancelled:
+                    continue  # keep draining so upstream puts never block
+                begin = time.perf_counter()
+                try:
+                    out = stage.func(item)
+                except Exception as e:
+                    out = None
+                    with self._lock:
+                        stage.failed += 1
+                    print(f"⚠️ {stage.name} failed: {e}")
+                with self._lock:
+                    stage.busy += time.perf_counter() - begin
+                    stage.processed += 1
+                    if out is None:
+                        stage.dropped += 1
+                    elif last:
+                        results.append(out)
+                if out is not None and not last:
+                    queues[index + 1].put(out)
+
+            # The stage's last worker to finish closes the next stage's inbox
+            with self._lock:
+                remaining[index] -= 1
+                closing = remaining[index] == 0
+            if closing and not last:
+                for _ in range(self.stages[index + 1].workers):
+                    queues[index + 1].put(_DONE)
+
+        threads = [threading.Thread(target=feed, name="pipeline-source")]
+        for index, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=work, args=(index,), name=f"pipeline-{stage.name}-{n}")
+                for n in range(stage.workers)
+            ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            print("🛑 Cancelling pipeline — finishing in-flight work...")
+            self.cancel()
+            for thread in threads:
+                thread.join()
+            raise
+        finally:
+            self.print_stats(time.perf_counter() - started)
+
+        return results
+
+    def print_stats(self, wall):
+        parts = [
+            f"{stage.name} {stage.processed} in {stage.busy / stage.workers:.1f}s"
+            for stage in self.stages
+        ]
+        state = " (cancelled)" if self.cancelled else ""
+        print(f"🧵 Pipeline{state}: {' | '.join(parts)} | wall {wall:.1f}s")
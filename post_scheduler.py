@@ -0,0 +1,183 @@
+# post_scheduler.py
+import os
+import json
+from datetime import datetime, timedelta
+import pytz
+
+# Remembers the last slot that ran so slots missed while the bot was down are caught up
+SCHEDULER_STATE_FILE = os.getenv("SCHEDULER_STATE_FILE", "scheduler_state.json")
+# Drive sync interval: drops to the minimum when new images show up, doubles while idle
+SYNC_MIN_INTERVAL = int(os.getenv("SYNC_MIN_INTERVAL", 120))
+SYNC_MAX_INTERVAL = int(os.getenv("SYNC_MAX_INTERVAL", 1800))
+
+
+def parse_slot_times(spec):
+    """Parse "09:00,14:30,20:30" into sorted (hour, minute) tuples."""
+    slots = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if part:
+            hour, minute = map(int, part.split(":"))
+            slots.add((hour, minute))
+    return sorted(slots)
+
+
+def spread_slots(start, end, count):
+    """`count` evenly spaced slot times from start to end ("HH:MM"), both included."""
+    start_h, start_m = map(int, start.split(":"))
+    end_h, end_m = map(int, end.split(":"))
+    first = start_h * 60 + start_m
+    last = end_h * 60 + end_m
+    if count <= 1 or last <= first:
+        return [(end_h, end_m)]
+    step = (last - first) / (count - 1)
+    return sorted({divmod(round(first + i * step), 60) for i in range(count)})
+
+
+def load_state():
+    """Return saved scheduler state ({} on first run)."""
+    try:
+        if not os.path.exists(SCHEDULER_STATE_FILE):
+            return {}
+        with open(SCHEDULER_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Could not load {SCHEDULER_STATE_FILE}: {e}")
+        return {}
+
+
+def save_state(state):
+    try:
+        tmp_path = SCHEDULER_STATE_FILE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, SCHEDULER_STATE_FILE)
+    except Exception as e:
+        print(f"⚠️ Could not save {SCHEDULER_STATE_FILE}: {e}")
+
+
+class PostScheduler:
+    """
+    Event-driven replacement for the fixed-interval poll loop (APScheduler).
+    - one cron job per daily post slot, fired at the exact slot time
+    - Drive sync on its own adaptive interval
+    - today's slots missed while the process was down run once on startup
+
+    post_job(slots_due, slots_left) posts the share of today's quota for
+    slots_due of the slots_left slots still open today; sync_job() returns
+    how many new images it downloaded. Jobs run one at a time.
+    """
+
+    def __init__(self, slots, timezone, post_job, sync_job, on_error=None):
+        self.slots = slots
+        self.tz = pytz.timezone(timezone)
+        self.post_job = post_job
+        self.sync_job = sync_job
+        self.on_error = on_error
+        self.sync_interval = SYNC_MIN_INTERVAL
+        self.state = load_state()
+        self._scheduler = None
+
+    def slots_on(self, day):
+        """Slot datetimes for a local calendar date."""
+        return [
+            self.tz.localize(datetime(day.year, day.month, day.day, hour, minute))
+            for hour, minute in self.slots
+        ]
+
+    def missed_slots(self, now):
+        """Today's slots that passed after the last recorded slot run."""
+        last = self.state.get("last_slot_run")
+        if not last:
+            return []
+        last = datetime.fromisoformat(last)
+        return [slot for slot in self.slots_on(now.date()) if last < slot <= now]
+
+    def _run_slot(self, slots_due=1):
+        now = datetime.now(self.tz)
+        # A slot firing at HH:MM:00.xx counts itself; later ones today are still open
+        upcoming = [slot for slot in self.slots_on(now.date()) if slot > now + timedelta(seconds=1)]
+        try:
+            self.post_job(slots_due, slots_due + len(upcoming))
+        except Exception as e:
+            self._report("post", e)
+        self.state["last_slot_run"] = now.isoformat(timespec="seconds")
+        save_state(self.state)
+
+    def _run_sync(self):
+        from apscheduler.triggers.interval import IntervalTrigger
+
+        try:
+            found = self.sync_job()
+            if found:
+                self.sync_interval = SYNC_MIN_INTERVAL
+            else:
+                self.sync_interval = min(SYNC_MAX_INTERVAL, self.sync_interval * 2)
+        except Exception as e:
+            self._report("sync", e)
+            self.sync_interval = min(SYNC_MAX_INTERVAL, self.sync_interval * 2)
+
+        self._scheduler.reschedule_job("drive-sync", trigger=IntervalTrigger(seconds=self.sync_interval))
+        print(f"💤 Next Drive sync in {self.sync_interval // 60}m {self.sync_interval % 60}s; "
+              f"next post slot at {self.next_slot_time()}")
+
+    def _report(self, job, error):
+        print(f"⚠️ Scheduled {job} job failed: {error}")
+        if self.on_error:
+            self.on_error(job, error)
+
+    def next_slot_time(self):
+        jobs = [job for job in self._scheduler.get_jobs() if job.id.startswith("post-") and job.next_run_time]
+        if not jobs:
+            return "n/a"
+        return min(job.next_run_time for job in jobs).strftime("%Y-%m-%d %H:%M %Z")
+
+    def run(self):
+        """Block, sleeping until the next slot or sync is due."""
+        from apscheduler.schedulers.blocking import BlockingScheduler
+        from apscheduler.executors.pool import ThreadPoolExecutor
+        from apscheduler.triggers.cron import CronTrigger
+        from apscheduler.triggers.interval import IntervalTrigger
+
+        self._scheduler = BlockingScheduler(
+            executors={"default": ThreadPoolExecutor(1)},
+            # A slot delayed by a long sync still runs, once
+            job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": None},
+            timezone=self.tz,
+        )
+        for hour, minute in self.slots:
+            self._scheduler.add_job(
+                self._run_slot,
+                CronTrigger(hour=hour, minute=minute, timezone=self.tz),
+                id=f"post-{hour:02d}{minute:02d}",
+            )
+
+        now = datetime.now(self.tz)
+        self._scheduler.add_job(
+            self._run_sync,
+            IntervalTrigger(seconds=self.sync_interval),
+            id="drive-sync",
+            next_run_time=now,
+        )
+
+        missed = self.missed_slots(now)
+        if missed:
+            print(f"⏪ Catching up {len(missed)} post slot(s) missed today")
+            self._scheduler.add_job(
+                self._run_slot,
+                args=(len(missed),),
+                id="catch-up",
+                next_run_time=now + timedelta(seconds=1),
+            )
+        elif "last_slot_run" not in self.state:
+            # First start: slots before now don't count as missed
+            self.state["last_slot_run"] = now.isoformat(timespec="seconds")
+            save_state(self.state)
+
+        slot_list = ", ".join(f"{hour:02d}:{minute:02d}" for hour, minute in self.slots)
+        print(f"📅 Post slots: {slot_list} {self.tz.zone}")
+        self._scheduler.start()
+
+    def shutdown(self):
+        if self._scheduler is not None and self._scheduler.running:
+            self._scheduler.shutdown(wait=False)
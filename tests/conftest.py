@@ -0,0 +1,47 @@
+# tests/conftest.py
+import os
+import sys
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+# Module-level singletons that hold state files opened relative to the working directory
+SINGLETONS = [
+    ("download_cache", "_index"), ("upload_queue", "_queue"), ("near_duplicates", "_index"),
+    ("upload_history", "_history"), ("board_routing", "_router"), ("get_board_id", "_directory"),
+    ("mail", "_dispatcher"),
+]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Run the test inside an empty directory, as the bot does on a fresh
+    checkout: history, queue, cache and token files all start out missing.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("downloads")
+    import importlib
+    for module_name, attr in SINGLETONS:
+        monkeypatch.setattr(importlib.import_module(module_name), attr, None)
+    return tmp_path
+
+
+@pytest.fixture
+def pinterest(workdir, monkeypatch):
+    """main pointed at a local Pinterest stand-in, posting to board "1"; yields (main, standin)."""
+    import main
+    import board_routing
+    import pinterest_media
+    from pinterest_standin import PinterestStandIn
+    standin = PinterestStandIn(latency=0).start()
+    monkeypatch.setattr(main, "PINTEREST_API_BASE", standin.base_url)
+    monkeypatch.setattr(pinterest_media, "PINTEREST_API_BASE", standin.base_url)
+    monkeypatch.setattr(main, "get_pinterest_token", lambda: "test-token")
+    monkeypatch.setattr(main, "_media_sources", pinterest_media.MediaSourceCache())
+    monkeypatch.setattr(board_routing, "DEFAULT_BOARD", "1")
+    monkeypatch.setattr(board_routing, "_router", board_routing.BoardRouter(routes={}, default_board="1"))
+    yield main, standin
+    standin.stop()
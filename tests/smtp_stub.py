@@ -0,0 +1,62 @@
+# tests/smtp_stub.py
+"""Minimal in-process SMTP server: enough of the protocol for smtplib.sendmail."""
+import email
+import threading
+import socketserver
+
+
+class SMTPStub:
+    """Accepts every message on 127.0.0.1; records connections and parsed messages."""
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        self.received = threading.Condition(self.lock)
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode("ascii") + b"\r\n")
+
+            def handle(self):
+                with stub.lock:
+                    stub.connections += 1
+                self.reply("220 stub ready")
+                for raw in self.rfile:
+                    command = raw.decode("ascii", "replace").strip().upper()
+                    if command.startswith(("EHLO", "HELO")):
+                        self.reply("250 stub")
+                    elif command == "DATA":
+                        self.reply("354 end with <CRLF>.<CRLF>")
+                        lines = []
+                        for line in self.rfile:
+                            if line == b".\r\n":
+                                break
+                            lines.append(line[1:] if line.startswith(b"..") else line)
+                        stub._store(email.message_from_bytes(b"".join(lines)))
+                        self.reply("250 queued")
+                    elif command == "QUIT":
+                        self.reply("221 bye")
+                        return
+                    else:  # MAIL, RCPT, NOOP, RSET
+                        self.reply("250 ok")
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _store(self, message):
+        with self.received:
+            self.messages.append(message)
+            self.received.notify_all()
+
+    def wait_for(self, count, timeout=5):
+        """Block until `count` messages have arrived; returns whether they did."""
+        with self.received:
+            return self.received.wait_for(lambda: len(self.messages) >= count, timeout)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
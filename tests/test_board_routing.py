@@ -0,0 +1,55 @@
+# tests/test_board_routing.py
+import os
+import json
+import board_routing
+from board_routing import BoardRouter
+
+
+def no_token():
+    raise AssertionError("a token was requested")
+
+
+def test_numeric_board_ids_need_no_token(workdir, monkeypatch):
+    monkeypatch.setattr(board_routing, "get_access_token", no_token)
+    router = BoardRouter(routes={"folderA": ["111", "222"]}, default_board="333")
+    assert router.boards_for_folders(["folderA"]) == ["111", "222"]
+    assert router.boards_for_folders(["folderB"]) == ["333"]
+
+
+def test_cached_board_names_need_no_token(workdir, monkeypatch):
+    monkeypatch.setattr(board_routing, "get_access_token", no_token)
+    with open("board_cache.json", "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": 9e12, "boards": {"mahakali": "444"}}, f)
+    router = BoardRouter(routes={"*": ["Mahakali"]}, default_board="333")
+    assert router.boards_for_folders(["folderA"]) == ["444"]
+
+
+def test_unresolvable_board_keeps_the_file_queued(workdir, monkeypatch):
+    import main
+    import get_board_id
+    from fake_drive import FakeDrive
+    drive = FakeDrive(folders=1, files_per_folder=1, file_size=1024, latency=0)
+    monkeypatch.setattr(main, "FOLDER_IDS", drive.folder_ids)
+    monkeypatch.setattr(main, "INCREMENTAL_SYNC", False)
+    monkeypatch.setattr(board_routing, "get_access_token", lambda: "test-token")
+    monkeypatch.setattr(board_routing, "_router",
+                        BoardRouter(routes={drive.folder_ids[0]: ["111", "Bhairava"]}, default_board="1"))
+
+    def boards_down(access_token):
+        raise RuntimeError("Failed to fetch boards: 503")
+    monkeypatch.setattr(get_board_id, "list_boards", boards_down)
+
+    main.sync_drive_images(drive)
+    filename = main.get_upload_queue(main.FOLDER_IDS).peek(None)[0]
+    main.mark_as_uploaded(board_routing.history_key(filename, "111"), pin_id="pin1", board_id="111")
+
+    # Bhairava still needs the pin: not uploaded, not retired, not handed out yet
+    assert not main.is_uploaded(filename)
+    assert main.get_pending_uploads() == []
+    assert main.get_upload_queue(main.FOLDER_IDS).peek(None) == [filename]
+
+    # The failed lookup is retried once the boards API is back
+    monkeypatch.setattr(board_routing, "BOARD_RETRY_SECONDS", 0)
+    monkeypatch.setattr(get_board_id, "list_boards", lambda access_token: [{"id": "555", "name": "Bhairava"}])
+    assert [os.path.basename(path) for path in main.get_pending_uploads()] == [filename]
+    assert main.boards_to_post(filename) == ["555"]
@@ -0,0 +1,20 @@
+# tests/test_daily_uploads.py
+import hashlib
+from fake_drive import FakeDrive, make_image_bytes
+
+
+def test_dropped_near_duplicate_is_replaced(pinterest, monkeypatch):
+    main, standin = pinterest
+    drive = FakeDrive(folders=1, files_per_folder=3, file_size=1024, latency=0)
+    # The second oldest image is the oldest one re-exported: same picture, different file
+    data = make_image_bytes(0, 4096)
+    drive._content["file1"] = data
+    drive.items["file1"].update(md5Checksum=hashlib.md5(data).hexdigest(), size=str(len(data)))
+    monkeypatch.setattr(main, "connect_drive", lambda: drive)
+    monkeypatch.setattr(main, "FOLDER_IDS", drive.folder_ids)
+    monkeypatch.setattr(main, "DRIVE_PREFETCH", False)
+    monkeypatch.setattr(main, "MAX_PINS_PER_DAY", 2)
+
+    assert main.run_daily_uploads("test-token")["posted"] == 2
+    assert standin.calls["POST /pins"] == 2
+    assert drive.calls["files.get_media"] == 3
@@ -0,0 +1,148 @@
+# tests/test_drive_sync.py
+import json
+import hashlib
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from fake_drive import FakeDrive, make_image_bytes
+
+
+class ChangesDrive(FakeDrive):
+    """FakeDrive with a changes feed, expiring page tokens and failing downloads."""
+
+    def __init__(self, files=2):
+        super().__init__(folders=1, files_per_folder=files, file_size=1024, latency=0)
+        self.log = []           # (token at which the change happened, item)
+        self.expired = False    # changes().list answers 410 Gone
+        self.failing = set()    # file ids whose download errors
+        self.calls["changes.list"] = 0
+
+    def add_image(self):
+        index = len(self.items)
+        data = make_image_bytes(index, 1024)
+        item = {
+            "id": f"file{index}", "name": f"image_{index}.gif", "mimeType": "image/gif",
+            "md5Checksum": hashlib.md5(data).hexdigest(), "parents": [self.folder_ids[0]],
+            "createdTime": f"2024-01-02T00:00:{index:02d}Z", "size": str(len(data)),
+        }
+        self.items[item["id"]] = item
+        self._content[item["id"]] = data
+        self.log.append((len(self.log) + 1, item))
+        return item
+
+    def changes(self):
+        return _Changes(self)
+
+    def get_media(self, fileId):
+        request = super().get_media(fileId)
+        if fileId in self.failing:
+            request.http = _BrokenHttp()
+        return request
+
+
+class _Changes:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def getStartPageToken(self):
+        return _Result({"startPageToken": str(len(self.drive.log) + 1)})
+
+    def list(self, pageToken, **kwargs):
+        self.drive.calls["changes.list"] += 1
+        if self.drive.expired:
+            raise HttpError(httplib2.Response({"status": 410}), b"Page token expired")
+        changes = [{"fileId": item["id"], "file": dict(item)}
+                   for at, item in self.drive.log if at >= int(pageToken)]
+        return _Result({"changes": changes, "newStartPageToken": str(len(self.drive.log) + 1)})
+
+
+class _Result:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self, num_retries=0):
+        return self.result
+
+
+class _BrokenHttp:
+    def request(self, *args, **kwargs):
+        raise RuntimeError("Drive unavailable")
+
+
+@pytest.fixture
+def sync(workdir, monkeypatch):
+    import main
+    drive = ChangesDrive()
+    monkeypatch.setattr(main, "FOLDER_IDS", drive.folder_ids)
+    monkeypatch.setattr(main, "INCREMENTAL_SYNC", True)
+
+    def run():
+        return main.sync_drive_images(drive)
+    return drive, run
+
+
+def saved_state():
+    with open("drive_page_token.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def queued():
+    from upload_queue import get_upload_queue
+    return get_upload_queue().peek()
+
+
+def test_first_run_lists_everything_and_saves_token(sync):
+    drive, run = sync
+    assert len(run()) == 2
+    assert drive.calls["files.list"] == 1
+    assert drive.calls["changes.list"] == 0
+    assert saved_state() == {"page_token": "1", "retry": []}
+    assert len(queued()) == 2
+
+
+def test_incremental_tick_only_fetches_changes(sync):
+    drive, run = sync
+    run()
+    drive.add_image()
+    assert len(run()) == 1
+    assert drive.calls["files.list"] == 1  # no second full listing
+    assert drive.calls["changes.list"] == 1
+    assert saved_state()["page_token"] == "2"
+    assert len(queued()) == 3
+
+
+def test_expired_token_falls_back_to_full_relist(sync):
+    drive, run = sync
+    run()
+    drive.add_image()
+    drive.expired = True
+    assert len(run()) == 1  # the two listed before are already in the cache
+    assert drive.calls["files.list"] == 2
+    assert saved_state()["page_token"] == "2"
+    assert len(queued()) == 3
+
+
+def test_failed_download_is_retried_next_tick(sync):
+    drive, run = sync
+    run()
+    first = drive.add_image()
+    drive.add_image()
+    drive.failing.add(first["id"])
+    assert len(run()) == 1
+    state = saved_state()
+    assert state["page_token"] == "3"
+    assert [item["id"] for item in state["retry"]] == [first["id"]]
+
+    drive.failing.clear()
+    assert len(run()) == 1  # no new changes, but the failed file comes back
+    assert saved_state() == {"page_token": "3", "retry": []}
+    assert len(queued()) == 4
+
+
+def test_full_listing_is_traced(sync):
+    from tracing import run_trace
+    drive, run = sync
+    with run_trace("sync") as trace:
+        run()
+    assert trace.totals["drive.list_images"]["count"] == 1
+    assert trace.totals["drive.list_images"]["errors"] == 0
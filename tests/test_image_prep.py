@@ -0,0 +1,41 @@
+# tests/test_image_prep.py
+import pytest
+import image_prep
+from PIL import Image
+from image_prep import UnsupportedImage, normalize_image, sniff_content_type
+
+
+def write(name, img, fmt, **params):
+    path = f"downloads/{name}"
+    img.save(path, fmt, **params)
+    return path
+
+
+def test_gif_is_sent_as_jpeg(workdir):
+    frames = [Image.new("L", (40, 40), shade) for shade in (30, 200)]
+    path = write("anim.gif", frames[0], "GIF", save_all=True, append_images=frames[1:])
+    out_path, content_type = normalize_image(path)
+    assert content_type == "image/jpeg" == sniff_content_type(out_path)
+    with Image.open(out_path) as img:
+        assert img.getpixel((0, 0))[0] < 100  # the first frame
+
+
+def test_transparent_gif_and_webp_become_png(workdir):
+    img = Image.new("RGBA", (40, 40), (255, 0, 0, 0))
+    for name, fmt in (("clear.gif", "GIF"), ("clear.webp", "WEBP")):
+        out_path, content_type = normalize_image(write(name, img, fmt))
+        assert content_type == "image/png" == sniff_content_type(out_path)
+
+
+def test_small_jpeg_is_sent_unchanged(workdir):
+    path = write("photo.jpg", Image.new("RGB", (40, 40), (10, 20, 30)), "JPEG", quality=30, optimize=True, progressive=True)
+    assert normalize_image(path) == (path, "image/jpeg")
+
+
+def test_without_pillow_only_jpeg_and_png_pass(workdir, monkeypatch):
+    jpeg = write("photo.jpg", Image.new("RGB", (40, 40)), "JPEG")
+    gif = write("anim.gif", Image.new("L", (40, 40)), "GIF")
+    monkeypatch.setattr(image_prep, "Image", None)
+    assert normalize_image(jpeg) == (jpeg, "image/jpeg")
+    with pytest.raises(UnsupportedImage):
+        normalize_image(gif)
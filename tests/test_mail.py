@@ -0,0 +1,84 @@
+# tests/test_mail.py
+import os
+import sys
+import time
+import subprocess
+import pytest
+import mail
+from smtp_stub import SMTPStub
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    stub = SMTPStub()
+    monkeypatch.setattr(mail, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(mail, "SMTP_PORT", stub.port)
+    monkeypatch.setattr(mail, "SMTP_USERNAME", None)
+    monkeypatch.setattr(mail, "EMAIL_USE_TLS", False)
+    monkeypatch.setattr(mail, "EMAIL_USER", "bot@example.com")
+    monkeypatch.setattr(mail, "EMAIL_RECEIVER", "owner@example.com")
+    yield stub
+    stub.stop()
+
+
+def body_of(message):
+    return message.get_payload()[0].get_payload(decode=True).decode("utf-8")
+
+
+def test_burst_is_one_digest_over_one_connection(smtp):
+    dispatcher = mail.NotificationDispatcher(window=0.2)
+    for n in range(3):
+        dispatcher.submit(f"Upload {n}", f"image_{n}.jpg posted")
+    assert smtp.wait_for(1)
+    dispatcher.submit("Upload 3", "image_3.jpg posted")
+    assert smtp.wait_for(2)
+    dispatcher.shutdown()
+
+    digest, single = smtp.messages
+    assert digest["Subject"] == "Pinterest bot digest: 3 notifications"
+    assert all(f"image_{n}.jpg posted" in body_of(digest) for n in range(3))
+    assert single["Subject"] == "Upload 3"
+    assert smtp.connections == 1
+
+
+def test_identical_messages_are_deduplicated_and_counted(smtp):
+    dispatcher = mail.NotificationDispatcher(window=60, dedup_window=3600)
+    for _ in range(3):
+        dispatcher.submit("Token refresh failed", "check PINTEREST_REFRESH_TOKEN")
+    dispatcher.flush()
+    assert smtp.wait_for(1)
+    assert "(repeated 2 more time(s))" in body_of(smtp.messages[0])
+
+    # Within the dedup window a repeat is only counted, not sent
+    dispatcher.submit("Token refresh failed", "check PINTEREST_REFRESH_TOKEN")
+    dispatcher.flush()
+    dispatcher.shutdown()
+    assert len(smtp.messages) == 1
+    assert dispatcher._suppressed == {("Token refresh failed", "check PINTEREST_REFRESH_TOKEN"): 1}
+
+
+def test_queued_mail_is_flushed_on_shutdown(smtp):
+    dispatcher = mail.NotificationDispatcher(window=60)
+    dispatcher.submit("Daily run finished", "3 pins posted")
+    time.sleep(0.1)
+    assert not smtp.messages  # still waiting for the digest window
+
+    dispatcher.shutdown()
+    assert [message["Subject"] for message in smtp.messages] == ["Daily run finished"]
+
+
+def test_sigterm_sends_queued_mail(smtp, workdir):
+    script = (
+        "import os, signal, time, main, mail\n"
+        "main.install_sigterm_handler()\n"
+        "mail.send_email_notification('Shutting down', 'queued before SIGTERM')\n"
+        "os.kill(os.getpid(), signal.SIGTERM)\n"
+        "time.sleep(10)\n"
+    )
+    env = dict(os.environ, SMTP_SERVER="127.0.0.1", SMTP_PORT=str(smtp.port), SMTP_USERNAME="",
+               EMAIL_USE_TLS="false", EMAIL_ASYNC="true", EMAIL_DIGEST_WINDOW="60",
+               EMAIL_USER="bot@example.com", EMAIL_RECEIVER="owner@example.com",
+               PYTHONPATH=os.pathsep.join(sys.path))
+    proc = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=30)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert [message["Subject"] for message in smtp.messages] == ["Shutting down"]
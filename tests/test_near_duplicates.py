@@ -0,0 +1,36 @@
+# tests/test_near_duplicates.py
+import os
+import json
+from PIL import Image
+from fake_drive import make_image_bytes
+import near_duplicates
+import upload_history
+
+
+def test_posted_hashes_survive_a_fresh_checkout(pinterest, monkeypatch):
+    main, standin = pinterest
+    posted = "downloads/0a1b2c3d4e5f60718293a4b5c6d7e8f9.gif"
+    with open(posted, "wb") as f:
+        f.write(make_image_bytes(1, 2048))
+    assert main.upload_to_pinterest(posted, "1")
+
+    with open("uploaded_files.jsonl", "r", encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    assert len(record["dhash"]) == 16
+
+    # A new checkout has the committed history but no near_duplicates.db and no downloads
+    near_duplicates.get_duplicate_index().close()
+    os.remove(near_duplicates.DUPLICATE_DB)
+    os.remove(posted)
+    monkeypatch.setattr(near_duplicates, "_index", None)
+    monkeypatch.setattr(upload_history, "_history", None)
+
+    copy = "downloads/ffeeddccbbaa99887766554433221100.jpg"
+    with open(copy, "wb") as f:
+        f.write(make_image_bytes(1, 2048))
+    with Image.open(copy) as img:
+        img.convert("RGB").save(copy, "JPEG", quality=70)
+
+    index = near_duplicates.get_duplicate_index()
+    index.hash_file(copy)
+    assert index.find_match(os.path.basename(copy))[::2] == (os.path.basename(posted), True)
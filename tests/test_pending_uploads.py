@@ -0,0 +1,51 @@
+# tests/test_pending_uploads.py
+import os
+import json
+import hashlib
+import pytest
+from fake_drive import FakeDrive, make_image_bytes
+from download_cache import original_name
+from upload_history import LEGACY_MIGRATED_KEY, get_history
+
+
+@pytest.fixture
+def bot(workdir, monkeypatch):
+    import main
+    import board_routing
+    drive = FakeDrive(folders=1, files_per_folder=3, file_size=1024, latency=0)
+    monkeypatch.setattr(main, "FOLDER_IDS", drive.folder_ids)
+    monkeypatch.setattr(main, "INCREMENTAL_SYNC", False)
+    monkeypatch.setattr(board_routing, "DEFAULT_BOARD", "1")
+    monkeypatch.setattr(board_routing, "_router", board_routing.BoardRouter(routes={}, default_board="1"))
+    return main, drive
+
+
+def pending_names(main):
+    return [original_name(os.path.basename(path)) for path in main.get_pending_uploads()]
+
+
+def test_legacy_history_names_count_as_uploaded(bot):
+    main, drive = bot
+    names = sorted(item["name"] for item in drive.items.values())
+    with open("uploaded_files.json", "w", encoding="utf-8") as f:
+        json.dump({"uploaded": names[:2]}, f)
+
+    main.sync_drive_images(drive)
+    assert pending_names(main) == names[2:]
+    assert LEGACY_MIGRATED_KEY in get_history()
+
+
+def test_new_file_sharing_a_legacy_name_is_posted(bot):
+    main, drive = bot
+    old = drive.items["file0"]
+    with open("uploaded_files.json", "w", encoding="utf-8") as f:
+        json.dump({"uploaded": [old["name"]]}, f)
+    main.sync_drive_images(drive)
+
+    # Same name, different picture, listed after the names were migrated
+    data = make_image_bytes(99, 1024)
+    drive._content["file99"] = data
+    drive.items["file99"] = dict(old, id="file99", md5Checksum=hashlib.md5(data).hexdigest(),
+                                 createdTime="2024-02-01T00:00:00Z")
+    main.sync_drive_images(drive)
+    assert pending_names(main).count(old["name"]) == 1
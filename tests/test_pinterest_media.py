@@ -0,0 +1,82 @@
+# tests/test_pinterest_media.py
+import os
+import pytest
+import pinterest_media
+from fake_drive import make_image_bytes
+
+STREAM_MIN = 64 * 1024
+
+
+@pytest.fixture(autouse=True)
+def upload_sizes(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "STREAM_UPLOAD_MIN_BYTES", STREAM_MIN)
+    # Files go out as written, so their size decides the mode (normalizing is tested in test_image_prep)
+    monkeypatch.setattr(main, "normalize_image", lambda path: (path, "image/jpeg"))
+
+
+def write_image(name, size):
+    path = os.path.join("downloads", name)
+    with open(path, "wb") as f:
+        f.write(make_image_bytes(len(name), size))
+    return path
+
+
+def test_large_file_goes_through_media_flow_in_order(pinterest, monkeypatch):
+    main, standin = pinterest
+    reads = []
+    read = pinterest_media.MultipartFileStream.read
+
+    def spy(self, size=-1):
+        data = read(self, size)
+        reads.append(len(data))
+        return data
+    monkeypatch.setattr(pinterest_media.MultipartFileStream, "read", spy)
+
+    path = write_image("large.gif", 4 * STREAM_MIN)
+    assert main.attempt_upload(path, "1")["ok"]
+
+    assert [r["call"] for r in standin.requests] == ["POST /media", "POST /upload", "GET /media/{id}", "POST /pins"]
+    upload = standin.requests[1]["headers"]
+    assert int(upload["Content-Length"]) > os.path.getsize(path)
+    assert "Transfer-Encoding" not in upload
+    # Sent in pieces read from disk, never as one buffered body
+    assert sum(reads) == int(upload["Content-Length"])
+    assert max(reads) < os.path.getsize(path)
+    assert standin.pins[0]["board_id"] == "1"
+
+
+def test_small_file_is_sent_inline(pinterest):
+    main, standin = pinterest
+    path = write_image("small.gif", STREAM_MIN // 4)
+    assert main.attempt_upload(path, "1")["ok"]
+    assert [r["call"] for r in standin.requests] == ["POST /pins"]
+
+
+def test_threshold_picks_the_mode(pinterest):
+    main, standin = pinterest
+    below = main.build_media_source("test-token", write_image("below.gif", STREAM_MIN - 1))
+    at = main.build_media_source("test-token", write_image("at.gif", STREAM_MIN))
+    assert below["source_type"] == "image_base64"
+    assert at == {"source_type": "image_url", "url": f"{standin.base_url}/objects/m1"}
+    assert standin.calls.get("POST /media") == 1
+
+
+def test_failed_media_upload_falls_back_to_inline(pinterest, monkeypatch):
+    main, standin = pinterest
+
+    def failing(token, path, content_type):
+        raise pinterest_media.MediaUploadError("media registration failed (503)")
+    monkeypatch.setattr(main, "stream_media_source", failing)
+
+    shared = main.build_media_source("test-token", write_image("shared.gif", STREAM_MIN // 4), shared=True)
+    large = main.build_media_source("test-token", write_image("large.gif", STREAM_MIN))
+    assert shared["source_type"] == large["source_type"] == "image_base64"
+
+
+def test_upload_without_location_is_sent_inline(pinterest):
+    main, standin = pinterest
+    standin.upload_location = False
+    source = main.build_media_source("test-token", write_image("large.gif", STREAM_MIN))
+    assert source["source_type"] == "image_base64"
+    assert standin.calls["POST /upload"] == 1
@@ -0,0 +1,56 @@
+# tests/test_upload_outbox.py
+import time
+import pytest
+from fake_drive import make_image_bytes
+from upload_outbox import UploadOutbox
+
+
+@pytest.fixture
+def job(pinterest):
+    """One outbox job whose earlier attempt may have created the pin."""
+    main, standin = pinterest
+    path = "downloads/0a1b2c3d4e5f60718293a4b5c6d7e8f9.gif"
+    with open(path, "wb") as f:
+        f.write(make_image_bytes(1, 2048))
+    outbox = UploadOutbox()
+    key = main.history_key("0a1b2c3d4e5f60718293a4b5c6d7e8f9.gif", "1")
+    outbox.enqueue(key, path, "1")
+    outbox.record_failure(key, {"retry": True, "maybe_posted": True, "error": "http_503"})
+    outbox.jobs[key]["next_attempt_at"] = 0
+
+    def drain(deadline=None):
+        return outbox.drain([key], main.attempt_upload, main.already_posted, deadline=deadline, workers=1)
+    return main, standin, outbox, key, drain
+
+
+def test_existing_pin_is_not_posted_again(job):
+    main, standin, outbox, key, drain = job
+    standin.pins.append({"id": "pin7", "board_id": "1", "note": main.pin_marker(key)})
+    assert drain() == 1
+    assert "POST /pins" not in standin.calls
+    assert key not in outbox.jobs
+    assert main.get_history().get(key)["pin_id"] == "pin7"
+
+
+def test_missing_pin_is_posted_once(job):
+    main, standin, outbox, key, drain = job
+    assert drain() == 1
+    assert standin.calls["POST /pins"] == 1
+    assert key not in outbox.jobs
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_failed_pin_check_defers_the_job(job, status):
+    main, standin, outbox, key, drain = job
+    standin.pin_list_error = status
+    assert drain(deadline=time.time()) == 0
+    assert "POST /pins" not in standin.calls
+    assert outbox.jobs[key]["state"] == "pending"
+    assert outbox.jobs[key]["maybe_posted"]
+
+    # Once Pinterest answers again the pin is found instead of duplicated
+    standin.pin_list_error = 0
+    standin.pins.append({"id": "pin7", "board_id": "1", "note": main.pin_marker(key)})
+    outbox.jobs[key]["next_attempt_at"] = 0
+    assert drain() == 1
+    assert "POST /pins" not in standin.calls
@@ -1,14 +1,26 @@
 # token_manager.py
 import os
-import requests
+import json
+import time
+import threading
+from http_client import get_session
+from pinterest_media import PINTEREST_API_BASE
+from metrics import TOKEN_REFRESHES
+from tracing import span
 
 APP_ID = os.getenv("PINTEREST_APP_ID")
 APP_SECRET = os.getenv("PINTEREST_APP_SECRET")
 
+# Refresh this many seconds before the access token actually expires
+TOKEN_REFRESH_SKEW = int(os.getenv("PINTEREST_TOKEN_REFRESH_SKEW", 300))
+# Optional encrypted on-disk cache; enabled when a Fernet key is provided
+TOKEN_CACHE_FILE = os.getenv("PINTEREST_TOKEN_CACHE_FILE", ".pinterest_token.cache")
+TOKEN_CACHE_KEY = os.getenv("PINTEREST_TOKEN_CACHE_KEY")
+
 
 def _call_refresh_api(refresh_token):
     """Internal: call Pinterest token endpoint and return parsed JSON."""
-    url = "https://api.pinterest.com/v5/oauth/token"
+    url = f"{PINTEREST_API_BASE}/oauth/token"
 
     data = {
         "grant_type": "refresh_token",
@@ -18,7 +30,7 @@ def _call_refresh_api(refresh_token):
     }
 
     # IMPORTANT: Pinterest REQUIRES form-data, NOT JSON
-    res = requests.post(url, data=data, timeout=30)
+    res = get_session().post(url, data=data, timeout=30)
 
     try:
         return res.json()
@@ -26,30 +38,152 @@ def _call_refresh_api(refresh_token):
         return {"error": "invalid_json_response", "raw": res.text}
 
 
-def refresh_access_token():
+def _fernet():
+    if not TOKEN_CACHE_KEY:
+        return None
+    from cryptography.fernet import Fernet
+    return Fernet(TOKEN_CACHE_KEY.encode("utf-8"))
+
+
+class TokenProvider:
     """
-    Public: refresh access token using the refresh token from env.
-    Returns access_token string on success, or None on failure.
+    Caches the Pinterest access token with its expiry.
+    - refreshes proactively TOKEN_REFRESH_SKEW seconds before expiry
+    - only one thread refreshes at a time; the others wait and reuse its result
+    - optionally persists the token encrypted so back-to-back runs skip the refresh
     """
-    refresh_token = os.getenv("PINTEREST_REFRESH_TOKEN")
-    if not refresh_token:
-        print("❌ No REFRESH TOKEN found in environment variables!")
-        return None
 
-    print("🔄 Refreshing Pinterest access token...")
-    result = _call_refresh_api(refresh_token)
-    print("🔐 Pinterest Token Response:", result)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = None  # None = unknown expiry, trust until a 401
+        self._load_cache()
+        if not self._token and os.getenv("PINTEREST_ACCESS_TOKEN"):
+            self._token = os.getenv("PINTEREST_ACCESS_TOKEN")
 
-    if "access_token" not in result:
-        print("❌ Failed to refresh token:", result)
-        return None
+    def _fresh(self):
+        if not self._token:
+            return False
+        return self._expires_at is None or time.time() < self._expires_at - TOKEN_REFRESH_SKEW
+
+    def get_token(self):
+        """Return a valid access token, refreshing it if needed (None on failure)."""
+        if self._fresh():
+            return self._token
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._fresh():
+                return self._token
+            return self._refresh()
+
+    def set_token(self, access_token, expires_in=None):
+        """Adopt a token obtained elsewhere (e.g. passed in by cron_job)."""
+        with self._lock:
+            if access_token == self._token and not expires_in:
+                return  # keep the expiry we already know
+            self._token = access_token
+            self._expires_at = time.time() + expires_in if expires_in else None
+
+    def invalidate(self, stale_token=None):
+        """
+        Drop the cached token after a 401. Passing the token that failed makes
+        this a no-op if another thread already replaced it.
+        """
+        with self._lock:
+            if stale_token is None or stale_token == self._token:
+                self._token = None
+                self._expires_at = None
+
+    def _refresh(self):
+        refresh_token = os.getenv("PINTEREST_REFRESH_TOKEN")
+        if not refresh_token:
+            print("❌ No REFRESH TOKEN found in environment variables!")
+            return None
+
+        print("🔄 Refreshing Pinterest access token...")
+        with span("token.refresh") as refresh:
+            result = _call_refresh_api(refresh_token)
+            if "access_token" not in result:
+                refresh.set(outcome="failed")
+
+        if "access_token" not in result:
+            TOKEN_REFRESHES.inc(outcome="failed")
+            print("❌ Failed to refresh token:", result)
+            return None
+        TOKEN_REFRESHES.inc(outcome="ok")
+
+        self._token = result["access_token"]
+        expires_in = result.get("expires_in")
+        self._expires_at = time.time() + int(expires_in) if expires_in else None
+        self._save_cache()
 
-    access_token = result["access_token"]
+        print("✅ Token refresh complete. Access token created for this job.")
+        return self._token
 
-    print("✅ Token refresh complete. Access token created for this job.")
-    return access_token
+    def _load_cache(self):
+        fernet = _fernet()
+        if not fernet or not os.path.exists(TOKEN_CACHE_FILE):
+            return
+        try:
+            with open(TOKEN_CACHE_FILE, "rb") as f:
+                data = json.loads(fernet.decrypt(f.read()))
+            self._token = data["access_token"]
+            self._expires_at = data.get("expires_at")
+            if self._fresh():
+                print("🔐 Using cached Pinterest access token.")
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable token cache: {e}")
+            self._token = None
+            self._expires_at = None
 
+    def _save_cache(self):
+        fernet = _fernet()
+        if not fernet:
+            return
+        try:
+            payload = json.dumps({"access_token": self._token, "expires_at": self._expires_at})
+            tmp_path = TOKEN_CACHE_FILE + ".tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(fernet.encrypt(payload.encode("utf-8")))
+            os.replace(tmp_path, TOKEN_CACHE_FILE)
+        except Exception as e:
+            print(f"⚠️ Could not write token cache: {e}")
 
-def refresh_and_update_env():
-    """Compatibility wrapper used by your existing code."""
-    return refresh_access_token()
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_token_provider():
+    """Process-wide token provider."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = TokenProvider()
+        return _provider
+
+
+def get_access_token():
+    """Public: cached access token, refreshed only when missing or about to expire."""
+    return get_token_provider().get_token()
+
+
+def refresh_access_token():
+    """
+    Public: force a refresh using the refresh token from env.
+    Returns access_token string on success, or None on failure.
+    """
+    provider = get_token_provider()
+    provider.invalidate()
+    return provider.get_token()
+
+
+def refresh_and_update_env(stale_token=None):
+    """
+    Compatibility wrapper used by your existing code (called after a 401).
+    Pass the token that was rejected so concurrent callers share one refresh.
+    """
+    provider = get_token_provider()
+    provider.invalidate(stale_token)
+    return provider.get_token()
@@ -0,0 +1,159 @@
+# tracing.py
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join("logs", "traces"))
+# Older trace files beyond this many are deleted when a new run starts
+TRACE_KEEP = int(os.getenv("TRACE_KEEP", 100))
+
+_current = None
+_current_lock = threading.Lock()
+
+
+class Span:
+    """Attributes of one timed operation; set(bytes=..., outcome=...) while it runs."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Trace:
+    """
+    One run's spans: appended to a JSON-lines file as they finish (so a
+    crashed run still leaves its timings) and aggregated for the summary.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.started = time.perf_counter()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.id = f"{kind}-{stamp}-{os.getpid()}"
+        self.path = os.path.join(TRACE_DIR, f"{self.id}.jsonl")
+        self._lock = threading.Lock()
+        self._file = None
+        self.totals = {}  # span name -> {count, total, max, errors, bytes}
+
+        try:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            _prune(TRACE_DIR, TRACE_KEEP - 1)
+            self._file = open(self.path, "a", encoding="utf-8")
+        except Exception as e:
+            print(f"⚠️ Could not open trace file {self.path}: {e}")
+
+    def record(self, name, started_at, duration, attrs):
+        entry = {
+            "trace": self.id,
+            "span": name,
+            "start": started_at,
+            "duration_ms": round(duration * 1000, 1),
+            "thread": threading.current_thread().name,
+        }
+        entry.update(attrs)
+        with self._lock:
+            totals = self.totals.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "errors": 0, "bytes": 0})
+            totals["count"] += 1
+            totals["total"] += duration
+            totals["max"] = max(totals["max"], duration)
+            totals["errors"] += entry.get("outcome") not in ("ok", "skipped")
+            totals["bytes"] += int(entry.get("bytes") or 0)
+            if self._file:
+                self._file.write(json.dumps(entry, default=str) + "\n")
+                self._file.flush()
+
+    def close(self):
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            if self._file:
+                summary = {"trace": self.id, "span": "summary", "duration_ms": round(elapsed * 1000, 1),
+                           "totals": self.totals}
+                self._file.write(json.dumps(summary) + "\n")
+                self._file.close()
+                self._file = None
+        self.print_summary(elapsed)
+
+    def print_summary(self, elapsed):
+        if not self.totals:
+            return
+        print(f"\n📊 Trace {self.id} ({elapsed:.1f}s) → {self.path}")
+        print(f"   {'span':<26}{'count':>6}{'total':>9}{'avg':>9}{'max':>9}{'errors':>8}{'MB':>8}")
+        for name, t in sorted(self.totals.items(), key=lambda item: -item[1]["total"]):
+            print(f"   {name:<26}{t['count']:>6}{t['total']:>8.2f}s{t['total'] / t['count']:>8.2f}s"
+                  f"{t['max']:>8.2f}s{t['errors']:>8}{t['bytes'] / (1024 * 1024):>8.1f}")
+
+
+def _prune(directory, keep):
+    files = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".jsonl")),
+        key=os.path.getmtime,
+    )
+    for path in files[:max(0, len(files) - keep)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@contextmanager
+def run_trace(kind):
+    """Collect the spans of one run (cron run, sync, post slot) into one trace file."""
+    global _current
+    with _current_lock:
+        if _current is not None:
+            nested = True
+        else:
+            nested = False
+            _current = Trace(kind)
+        trace = _current
+    try:
+        yield trace
+    finally:
+        if not nested:
+            with _current_lock:
+                _current = None
+            trace.close()
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time the with-block as one span of the current run. The outcome is
+    "error" if it raises, otherwise "ok" unless set() says otherwise.
+    Outside a run this only hands out a Span and records nothing.
+    """
+    trace = _current
+    current = Span(name, dict(attrs))
+    if trace is None:
+        yield current
+        return
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs.setdefault("outcome", "error")
+        current.attrs.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.attrs.setdefault("outcome", "ok")
+        trace.record(name, started_at, time.perf_counter() - start, current.attrs)
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,173 @@
+# upload_history.py
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from upload_journal import JOURNAL_FILE, JournalHistory
+
+HISTORY_DB = "uploaded_files.db"
+LEGACY_TRACK_FILE = "uploaded_files.json"
+# "journal" (git-friendly, used by the GitHub Actions cron) or "sqlite" (long-running hosts)
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "journal").lower()
+
+
+class UploadHistory:
+    """
+    Upload history backed by SQLite.
+    Keys are loaded once into an in-memory set, so lookups never touch disk;
+    each new upload is a single INSERT instead of rewriting the whole file.
+    """
+
+    def __init__(self, db_path=HISTORY_DB, legacy_file=LEGACY_TRACK_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                file_key    TEXT PRIMARY KEY,
+                uploaded_at TEXT NOT NULL,
+                pin_id      TEXT,
+                board_id    TEXT,
+                dhash       TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_uploads_uploaded_at ON uploads (uploaded_at);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(uploads)")}
+        if "dhash" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE uploads ADD COLUMN dhash TEXT")
+        self._migrate_json(legacy_file)
+        self._keys = {row[0] for row in self._conn.execute("SELECT file_key FROM uploads")}
+
+    def _migrate_json(self, legacy_file, journal_file=JOURNAL_FILE):
+        """
+        One-time import of the journal history: the uploaded_files.json
+        snapshot plus any uploaded_files.jsonl lines not yet compacted into it.
+        """
+        done = self._conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if done or not (os.path.exists(legacy_file) or os.path.exists(journal_file)):
+            return
+        try:
+            journal = JournalHistory(legacy_file, journal_file)
+            records = [journal.get(key) for key in journal.keys()]
+        except Exception as e:
+            print(f"⚠️ Could not migrate {legacy_file}: {e}")
+            return
+
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO uploads (file_key, uploaded_at, pin_id, board_id, dhash) VALUES (?, ?, ?, ?, ?)",
+                [(r["file_key"], r.get("uploaded_at") or "", r.get("pin_id"), r.get("board_id"), r.get("dhash"))
+                 for r in records]
+            )
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (_now(),))
+        print(f"📦 Migrated {len(records)} entries from {legacy_file} and {journal_file} into the upload history.")
+
+    def __contains__(self, file_key):
+        return file_key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def keys(self):
+        """Snapshot of every uploaded key."""
+        with self._lock:
+            return set(self._keys)
+
+    def dhashes(self):
+        """{key: dhash hex} of the uploads recorded with an image hash."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT file_key, dhash FROM uploads WHERE dhash IS NOT NULL AND dhash != ''"))
+
+    def add(self, file_key, pin_id=None, board_id=None, dhash=None):
+        """Record an upload (dhash: the image's perceptual hash); returns False if the key was already present."""
+        with self._lock:
+            if file_key in self._keys:
+                return False
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO uploads (file_key, uploaded_at, pin_id, board_id, dhash) VALUES (?, ?, ?, ?, ?)",
+                    (file_key, _now(), pin_id, board_id, dhash)
+                )
+            self._keys.add(file_key)
+            return True
+
+    def get(self, file_key):
+        """Return the stored record for a key, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_key, uploaded_at, pin_id, board_id, dhash FROM uploads WHERE file_key = ?",
+                (file_key,)
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(("file_key", "uploaded_at", "pin_id", "board_id", "dhash"), row))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# Written once every legacy bare-name entry has been moved to a content key
+LEGACY_MIGRATED_KEY = "legacy-names-migrated"
+# Keys written since content-addressed downloads: <md5Checksum><ext>, maybe @<board id>
+_CONTENT_KEY = re.compile(r"^[0-9a-f]{32}\.[a-z0-9]+(@.+)?$")
+
+
+def legacy_names(history):
+    """
+    History keys that are bare Drive file names (written before keys were
+    content-addressed), or an empty set once they have been migrated.
+    """
+    if LEGACY_MIGRATED_KEY in history:
+        return set()
+    return {key for key in history.keys() if not _CONTENT_KEY.match(key)}
+
+
+class LegacyNameMigration:
+    """
+    One-time move of legacy bare-name history entries to the content keys of
+    the Drive items carrying those names. Fed one complete Drive listing;
+    once it has finished, names are never matched again, so a new file that
+    happens to share an old file's name is posted like any other.
+    """
+
+    def __init__(self, history):
+        self.history = history
+        self.names = legacy_names(history)
+        self.moved = 0
+
+    def claim(self, name, key):
+        """Record `key` as uploaded if `name` was posted under its bare name."""
+        if name in self.names and self.history.add(key):
+            self.moved += 1
+
+    def finish(self):
+        """Call after a complete listing: legacy names not seen in it are dropped for good."""
+        if self.names:
+            self.history.add(LEGACY_MIGRATED_KEY)
+            print(f"📦 Moved {self.moved} upload history entries from Drive names to content keys "
+                  f"({len(self.names)} legacy names).")
+            self.names = set()
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    """Process-wide history store, opened on first use."""
+    global _history
+    with _history_lock:
+        if _history is None:
+            if HISTORY_BACKEND == "sqlite":
+                _history = UploadHistory()
+            else:
+                _history = JournalHistory()
+                _history.compact_if_needed()
+        return _history
@@ -0,0 +1,147 @@
+# upload_journal.py
+import os
+import sys
+import json
+import threading
+from datetime import datetime, timezone
+
+# Snapshot keeps the original uploaded_files.json layout ({"uploaded": [...]})
+SNAPSHOT_FILE = "uploaded_files.json"
+# One JSON line per upload event, appended after the snapshot was written
+JOURNAL_FILE = "uploaded_files.jsonl"
+# Fold the journal into the snapshot once it grows past this many lines (0 = never)
+JOURNAL_COMPACT_THRESHOLD = int(os.getenv("JOURNAL_COMPACT_THRESHOLD", 500))
+
+
+class JournalHistory:
+    """
+    Upload history stored as a snapshot plus an append-only journal.
+    Each upload appends one line, so a run's git diff is a few added lines
+    instead of a rewritten file. compact() folds the journal into the snapshot.
+    """
+
+    def __init__(self, snapshot_file=SNAPSHOT_FILE, journal_file=JOURNAL_FILE):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self._lock = threading.Lock()
+        self._records = {}
+        self._journal_lines = 0
+        self._replay()
+
+    def _replay(self):
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                records = data.get("records", {})
+                for key in data.get("uploaded", []):
+                    self._records[key] = records.get(key, {})
+            except Exception as e:
+                print(f"⚠️ Could not load {self.snapshot_file}: {e}")
+
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                        file_key = event.pop("file_key")
+                    except (ValueError, KeyError):
+                        # Torn write from a crash: skip it
+                        continue
+                    self._records.setdefault(file_key, event)
+                    self._journal_lines += 1
+
+    def __contains__(self, file_key):
+        return file_key in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def keys(self):
+        """Snapshot of every uploaded key."""
+        with self._lock:
+            return set(self._records)
+
+    def get(self, file_key):
+        """Return the stored record for a key, or None."""
+        with self._lock:
+            record = self._records.get(file_key)
+        return dict(record, file_key=file_key) if record is not None else None
+
+    def dhashes(self):
+        """{key: dhash hex} of the uploads recorded with an image hash."""
+        with self._lock:
+            return {key: record["dhash"] for key, record in self._records.items() if record.get("dhash")}
+
+    def add(self, file_key, pin_id=None, board_id=None, dhash=None):
+        """
+        Append an upload event; returns False if the key was already present.
+        dhash (hex) is the posted image's perceptual hash, kept so later runs
+        catch near-duplicates of it without the image.
+        """
+        with self._lock:
+            if file_key in self._records:
+                return False
+            record = {
+                "uploaded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "pin_id": pin_id,
+                "board_id": board_id,
+            }
+            if dhash:
+                record["dhash"] = dhash
+            line = json.dumps({"file_key": file_key, **record}, ensure_ascii=False) + "\n"
+            self._append(line.encode("utf-8"))
+            self._records[file_key] = record
+            self._journal_lines += 1
+            return True
+
+    def _append(self, data):
+        """Single O_APPEND write + fsync; a torn tail line is terminated first."""
+        fd = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size > 0:
+                with open(self.journal_file, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        data = b"\n" + data
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def compact(self):
+        """Write every record into the snapshot atomically, then empty the journal."""
+        with self._lock:
+            data = {
+                "uploaded": sorted(self._records),
+                "records": {key: self._records[key] for key in sorted(self._records) if self._records[key]},
+            }
+            tmp_path = self.snapshot_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_file)
+
+            # A crash before this point only leaves duplicate events, which replay ignores
+            with open(self.journal_file, "w", encoding="utf-8"):
+                pass
+            compacted = self._journal_lines
+            self._journal_lines = 0
+
+        print(f"🗜️  Compacted {compacted} journal entries into {self.snapshot_file}.")
+        return compacted
+
+    def compact_if_needed(self):
+        if JOURNAL_COMPACT_THRESHOLD and self._journal_lines >= JOURNAL_COMPACT_THRESHOLD:
+            self.compact()
+
+    def close(self):
+        pass
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["compact"]:
+        JournalHistory().compact()
+    else:
+        print("Usage: python upload_journal.py compact")
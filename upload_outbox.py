@@ -0,0 +1,138 @@
+# upload_outbox.py
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from upload_scheduler import UPLOAD_WORKERS
+
+OUTBOX_FILE = "upload_outbox.json"
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 6))
+# How long a single run keeps retrying before leaving jobs for the next run
+OUTBOX_RETRY_WINDOW = int(os.getenv("OUTBOX_RETRY_WINDOW", 600))
+BACKOFF_BASE = 5    # seconds
+BACKOFF_CAP = 300   # seconds
+
+# pin_exists() result when Pinterest couldn't be asked (429, 5xx, network error)
+PIN_UNKNOWN = object()
+
+
+class UploadOutbox:
+    """
+    Durable list of pending upload jobs (attempts, next attempt time, last error).
+    Jobs survive restarts, so a pin whose earlier attempt may have gone through
+    is checked against Pinterest before it is posted again.
+    """
+
+    def __init__(self, path=OUTBOX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.jobs = json.load(f).get("jobs", {})
+            except Exception as e:
+                print(f"⚠️ Could not load {path}: {e}")
+
+    def _save(self):
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"jobs": self.jobs}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ Could not save {self.path}: {e}")
+
+    def enqueue(self, key, path, board_id=None):
+        """Add a job; an existing job keeps its attempts and 'maybe posted' flag."""
+        with self._lock:
+            job = self.jobs.setdefault(key, {
+                "path": path,
+                "attempts": 0,
+                "next_attempt_at": 0,
+                "last_error": None,
+                "maybe_posted": False,
+                "state": "pending",
+            })
+            job["path"] = path
+            job["board_id"] = board_id
+            if job["state"] == "failed":
+                # A new run gives permanently failed jobs one more round
+                job.update(state="pending", attempts=0, next_attempt_at=0)
+            self._save()
+
+    def complete(self, key):
+        with self._lock:
+            self.jobs.pop(key, None)
+            self._save()
+
+    def record_failure(self, key, result):
+        """Schedule a retry with full-jitter exponential backoff, or give up."""
+        with self._lock:
+            job = self.jobs[key]
+            job["attempts"] += 1
+            job["last_error"] = result.get("error")
+            job["maybe_posted"] = job["maybe_posted"] or result.get("maybe_posted", False)
+            if not result.get("retry") or job["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                job["state"] = "failed"
+            else:
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (job["attempts"] - 1)))
+                job["next_attempt_at"] = time.time() + delay
+            self._save()
+            return job
+
+    def drain(self, keys, attempt, pin_exists, deadline=None, workers=None):
+        """
+        Work through the given job keys until each has succeeded, failed for
+        good, or the deadline passes. attempt(path, board_id) returns a result
+        dict ({ok, retry, maybe_posted, error}); pin_exists(path, board_id)
+        returns a pin id when an earlier attempt turns out to have succeeded,
+        None when it didn't, or PIN_UNKNOWN when that can't be told yet (the
+        job is then retried later instead of risking a duplicate pin).
+        Returns the number of jobs that ended up posted.
+        """
+        deadline = deadline or time.time() + OUTBOX_RETRY_WINDOW
+        keys = [key for key in keys if key in self.jobs]
+        posted = 0
+
+        def run(key):
+            job = self.jobs[key]
+            pin_id = pin_exists(job["path"], job.get("board_id")) if job["maybe_posted"] else None
+            if pin_id is PIN_UNKNOWN:
+                result = {"ok": False, "retry": True, "error": "could not check Pinterest for an earlier pin"}
+            elif pin_id:
+                print(f"🔎 {key} was already posted as pin {pin_id} — not re-posting.")
+                self.complete(key)
+                return True
+            else:
+                result = attempt(job["path"], job.get("board_id"))
+                if result.get("ok"):
+                    self.complete(key)
+                    return True
+            job = self.record_failure(key, result)
+            if job["state"] == "failed":
+                print(f"❌ Giving up on {key} after {job['attempts']} attempt(s): {job['last_error']}")
+            else:
+                wait = job["next_attempt_at"] - time.time()
+                print(f"🔁 Retrying {key} in {wait:.0f}s (attempt {job['attempts']}): {job['last_error']}")
+            return False
+
+        with ThreadPoolExecutor(max_workers=workers or UPLOAD_WORKERS) as pool:
+            while True:
+                active = [key for key in keys if key in self.jobs and self.jobs[key]["state"] == "pending"]
+                if not active:
+                    break
+                now = time.time()
+                due = [key for key in active if self.jobs[key]["next_attempt_at"] <= now]
+                if not due:
+                    next_at = min(self.jobs[key]["next_attempt_at"] for key in active)
+                    if next_at > deadline:
+                        print(f"⏳ {len(active)} upload(s) left in the outbox for the next run.")
+                        break
+                    time.sleep(max(0.0, next_at - now))
+                    continue
+                posted += sum(1 for ok in pool.map(run, due) if ok)
+
+        return posted
@@ -0,0 +1,204 @@
+# upload_queue.py
+import os
+import json
+import heapq
+import sqlite3
+import threading
+from download_cache import pending_files, folders_for, created_for
+
+UPLOAD_QUEUE_DB = "upload_queue.db"
+# "created" (oldest Drive createdTime first), "round_robin" (one folder after
+# another) or "weighted" (folders share posts in proportion to QUEUE_FOLDER_WEIGHTS)
+QUEUE_POLICY = os.getenv("UPLOAD_QUEUE_POLICY", "round_robin").lower()
+# JSON object mapping a Drive folder id to its share, e.g. {"1AbC...": 3}; others get 1
+QUEUE_FOLDER_WEIGHTS = os.getenv("QUEUE_FOLDER_WEIGHTS", "")
+
+POLICIES = ("created", "round_robin", "weighted")
+
+
+def load_weights(spec=QUEUE_FOLDER_WEIGHTS):
+    """Parse QUEUE_FOLDER_WEIGHTS into {folder_id: weight > 0}."""
+    if not spec.strip():
+        return {}
+    try:
+        weights = {folder: float(weight) for folder, weight in json.loads(spec).items()}
+    except (ValueError, TypeError, AttributeError) as e:
+        print(f"⚠️ Ignoring invalid QUEUE_FOLDER_WEIGHTS: {e}")
+        return {}
+    return {folder: weight for folder, weight in weights.items() if weight > 0}
+
+
+class UploadQueue:
+    """
+    Downloaded images waiting to be posted, kept in SQLite so the backlog
+    is never rebuilt from the download folder. Each folder is a queue
+    ordered by Drive createdTime (B-tree index: O(log n) push and remove).
+    peek(n) merges the folder heads by the configured policy; round_robin
+    and weighted use stride scheduling, where every post from a folder moves
+    its "pass" forward by 1/weight and the folder with the lowest pass goes
+    next. Its cost depends on n and the number of folders, not the backlog.
+    """
+
+    def __init__(self, db_path=UPLOAD_QUEUE_DB, folder_ids=(), policy=QUEUE_POLICY, weights=None):
+        if policy not in POLICIES:
+            print(f"⚠️ Unknown UPLOAD_QUEUE_POLICY {policy!r}; using round_robin.")
+            policy = "round_robin"
+        self.policy = policy
+        self.weights = load_weights() if weights is None else weights
+        self.folder_ids = list(folder_ids)
+        self._rank = {folder: n for n, folder in enumerate(self.folder_ids)}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pending (
+                file_name TEXT PRIMARY KEY,
+                folder    TEXT NOT NULL,
+                created   TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_pending_created ON pending (created, file_name);
+            CREATE INDEX IF NOT EXISTS idx_pending_folder ON pending (folder, created, file_name);
+            CREATE TABLE IF NOT EXISTS folders (
+                folder  TEXT PRIMARY KEY,
+                pass    REAL NOT NULL DEFAULT 0,
+                waiting INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._folders = {
+            folder: {"pass": pass_, "waiting": waiting}
+            for folder, pass_, waiting in self._conn.execute("SELECT folder, pass, waiting FROM folders")
+        }
+        # Pass of the most recent turn; folders that were empty rejoin from here
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'vtime'").fetchone()
+        self._vtime = float(row[0]) if row else 0.0
+
+    def __len__(self):
+        with self._lock:
+            return sum(state["waiting"] for state in self._folders.values())
+
+    def __contains__(self, file_name):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM pending WHERE file_name = ?", (file_name,)).fetchone() is not None
+
+    def queue_folder(self, parents):
+        """The folder an image queues under: its first parent in FOLDER_IDS order."""
+        ranked = sorted(parents, key=lambda folder: self._rank.get(folder, len(self._rank)))
+        return ranked[0] if ranked else ""
+
+    def _weight(self, folder):
+        return self.weights.get(folder, 1.0) if self.policy == "weighted" else 1.0
+
+    def push(self, file_name, parents, created):
+        """Queue an image (no-op if it is already queued)."""
+        folder = self.queue_folder(parents)
+        with self._lock:
+            with self._conn:
+                added = self._conn.execute(
+                    "INSERT OR IGNORE INTO pending (file_name, folder, created) VALUES (?, ?, ?)",
+                    (file_name, folder, created or "")
+                ).rowcount
+                if not added:
+                    return False
+                state = self._folders.setdefault(folder, {"pass": 0.0, "waiting": 0})
+                if not state["waiting"]:
+                    # A folder that was empty starts level with the others instead of
+                    # cashing in the turns it didn't need
+                    state["pass"] = max(state["pass"], self._vtime)
+                state["waiting"] += 1
+                self._save_folder(folder)
+            return True
+
+    def remove(self, file_name):
+        """Take a posted image off the queue; its folder's turn passes."""
+        with self._lock:
+            row = self._conn.execute("SELECT folder FROM pending WHERE file_name = ?", (file_name,)).fetchone()
+            if not row:
+                return False
+            folder = row[0]
+            with self._conn:
+                self._conn.execute("DELETE FROM pending WHERE file_name = ?", (file_name,))
+                state = self._folders[folder]
+                state["waiting"] = max(0, state["waiting"] - 1)
+                self._vtime = max(self._vtime, state["pass"])
+                state["pass"] += 1.0 / self._weight(folder)
+                self._save_folder(folder)
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('vtime', ?)", (str(self._vtime),))
+            return True
+
+    def _save_folder(self, folder):
+        state = self._folders[folder]
+        self._conn.execute(
+            "INSERT INTO folders (folder, pass, waiting) VALUES (?, ?, ?) "
+            "ON CONFLICT(folder) DO UPDATE SET pass = excluded.pass, waiting = excluded.waiting",
+            (folder, state["pass"], state["waiting"])
+        )
+
+    def peek(self, n=None):
+        """The next n file names to post (all of them when n is None), without removing them."""
+        with self._lock:
+            if self.policy == "created":
+                rows = self._conn.execute(
+                    "SELECT file_name FROM pending ORDER BY created, file_name LIMIT ?",
+                    (-1 if n is None else n,)
+                )
+                return [row[0] for row in rows]
+
+            # Each folder can contribute at most n files, so fetch that many heads from each
+            limit = -1 if n is None else n
+            heads = {}
+            heap = []
+            for folder, state in self._folders.items():
+                if not state["waiting"]:
+                    continue
+                rows = self._conn.execute(
+                    "SELECT file_name FROM pending WHERE folder = ? ORDER BY created, file_name LIMIT ?",
+                    (folder, limit)
+                )
+                heads[folder] = [row[0] for row in rows]
+                if heads[folder]:
+                    heapq.heappush(heap, (state["pass"], self._rank.get(folder, len(self._rank)), folder, 0))
+
+        picked = []
+        while heap and (n is None or len(picked) < n):
+            pass_, rank, folder, taken = heapq.heappop(heap)
+            picked.append(heads[folder][taken])
+            if taken + 1 < len(heads[folder]):
+                heapq.heappush(heap, (pass_ + 1.0 / self._weight(folder), rank, folder, taken + 1))
+        return picked
+
+    def seeded(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM meta WHERE key = 'seeded'").fetchone() is not None
+
+    def mark_seeded(self):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seeded', '1')")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_upload_queue(folder_ids=()):
+    """
+    Process-wide upload queue, opened on first use. The first time it is
+    created, the download cache's unposted files are queued (older versions
+    kept the backlog implicitly in the download folder).
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = UploadQueue(folder_ids=folder_ids)
+            if not _queue.seeded():
+                names = pending_files()
+                for name in names:
+                    _queue.push(name, folders_for(name), created_for(name))
+                _queue.mark_seeded()
+                if names:
+                    print(f"📦 Queued {len(names)} downloaded images in {UPLOAD_QUEUE_DB}.")
+        return _queue
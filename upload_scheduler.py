@@ -0,0 +1,106 @@
+# upload_scheduler.py
+import os
+import time
+import threading
+
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 3))
+# Starting budget until Pinterest's X-RateLimit-* headers tell us the real one
+UPLOAD_RATE_PER_SEC = float(os.getenv("UPLOAD_RATE_PER_SEC", 1.0))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", 3))
+MAX_BACKOFF = 300  # seconds
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket sized from Pinterest rate-limit headers.
+    A 429 pauses every caller until Retry-After (or an exponential backoff)
+    has passed, instead of each thread sleeping blindly.
+    """
+
+    def __init__(self, capacity, rate):
+        self._lock = threading.Condition()
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._consecutive_429 = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    wait = (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+                self._lock.wait(timeout=min(wait, MAX_BACKOFF))
+
+    def observe(self, response):
+        """Resize the bucket from a response's rate-limit headers; back off on 429."""
+        headers = response.headers
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            limit = _header_number(headers, "X-RateLimit-Limit")
+            remaining = _header_number(headers, "X-RateLimit-Remaining")
+            reset = _header_number(headers, "X-RateLimit-Reset")
+            if reset is not None and reset > 1e9:
+                reset = max(0.0, reset - time.time())  # epoch timestamp form
+
+            if limit:
+                self.capacity = max(1.0, min(limit, UPLOAD_WORKERS * 2))
+            if remaining is not None:
+                self.tokens = min(self.tokens, remaining)
+                if reset and remaining > 0:
+                    # Spread what is left of this window evenly over the time until it resets
+                    self.rate = max(remaining / reset, 1.0 / MAX_BACKOFF)
+                if remaining <= 0 and reset:
+                    self._paused_until = max(self._paused_until, now + reset)
+
+            if response.status_code == 429:
+                self._consecutive_429 += 1
+                retry_after = _header_number(headers, "Retry-After")
+                if retry_after is None:
+                    retry_after = reset or min(MAX_BACKOFF, 2 ** self._consecutive_429)
+                self._paused_until = max(self._paused_until, now + min(retry_after, MAX_BACKOFF))
+                print(f"🚦 Rate limited — pausing uploads for {retry_after:.0f}s")
+            else:
+                self._consecutive_429 = 0
+
+            self._lock.notify_all()
+
+
+def _header_number(headers, name):
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+RATE_LIMITER = TokenBucket(capacity=UPLOAD_WORKERS, rate=UPLOAD_RATE_PER_SEC)
+
+
+def send_with_rate_limit(send):
+    """
+    Call send() (which performs one HTTP request) under the shared bucket,
+    retrying 429s up to RATE_LIMIT_RETRIES times once the pause has elapsed.
+    """
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        RATE_LIMITER.acquire()
+        res = send()
+        RATE_LIMITER.observe(res)
+        if res.status_code != 429:
+            return res
+    return res
+